@@ -1,9 +1,19 @@
 # from https://github.com/Ahrkylien/BF1942-Extraction-Readout-Scripts
 # license not specified
 
+import hashlib
+import io
+import mmap
 import os
 import struct
+import time
 import lzo
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict, deque
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager, nullcontext
 from datetime import datetime
 
 def read_i(f, n = 1, forceList = False):
@@ -29,6 +39,14 @@ def write_s(f, value):
 def write_bytes(f, value):
     return f.write(bytearray(value))
 
+MAX_SEGMENT_SIZE = 32768
+READER_CACHED_SEGMENTS = 4 # decompressed segments kept by an open entry
+PARALLEL_SEGMENTS_MIN = 8 # entries with at least this many segments are decompressed segment by segment when extracting in parallel
+
+COMPRESSION_STORE = 0 # segment is stored as a single LZO literal run, no compression is attempted
+COMPRESSION_FAST = 1 # lzo1x_1
+COMPRESSION_BEST = 9 # lzo1x_999
+
 XpackHeaderIdNames = {
     0x48128321 : "Default",
     0x52382184 : "XPack1",
@@ -37,6 +55,8 @@ XpackHeaderIdNames = {
 }
 
 class RefractorFlatArchive_Info:
+    __slots__ = ('csize', 'ucsize', 'doffset')
+    
     def __init__(self, f = None, csize = None, ucsize = None, doffset = None):
         self.csize = read_i(f) if f != None else csize
         self.ucsize = read_i(f) if f != None else ucsize
@@ -46,6 +66,8 @@ class RefractorFlatArchive_Info:
         write_i(f, [self.csize, self.ucsize, self.doffset])
 
 class RefractorFlatArchiveEntry:
+    __slots__ = ('path', 'is_external', 'is_string', 'file_info', 'external_filepath', 'file_contents')
+    
     def __init__(self, path, is_external = False, is_string = False, file_info = None, external_filepath = None, file_contents = None):
         self.path = path
         self.is_external = is_external
@@ -54,19 +76,205 @@ class RefractorFlatArchiveEntry:
         self.external_filepath = external_filepath
         self.file_contents = file_contents
 
+def storeSegment(block):
+    # builds a valid LZO1X stream holding the block as one literal run, encoded the same way lzo1x_1 encodes a trailing run
+    length = len(block)
+    if length == 0:
+        header = b''
+    elif length <= 238:
+        header = bytes([17 + length])
+    else:
+        extra = length - 18
+        zeros = (extra - 1) // 255
+        header = b'\x00' * (zeros + 1) + bytes([extra - 255 * zeros])
+    return header + block + b'\x11\x00\x00' # end of stream marker
+
+def storedSegmentSize(length):
+    if length == 0:
+        return 3
+    if length <= 238:
+        return length + 4
+    return length + 5 + (length - 19) // 255
+
+class CompressionPolicy:
+    def __init__(self, level = COMPRESSION_BEST, extensions = None, storeIncompressible = False):
+        self.level = level
+        self.extensions = {} if extensions == None else {extension.lower(): level for extension, level in extensions.items()}
+        self.storeIncompressible = storeIncompressible
+    
+    def getLevel(self, path):
+        # override for per-entry policies
+        return self.extensions.get(os.path.splitext(path)[1].lower(), self.level)
+    
+    def compress(self, block, level):
+        if level == COMPRESSION_STORE:
+            return storeSegment(block)
+        compressed = lzo.compress(block, level, False) # Include metadata header = False
+        if self.storeIncompressible and len(compressed) > storedSegmentSize(len(block)):
+            return storeSegment(block)
+        return compressed
+
+FILE_NAME_LENGTH = struct.Struct('I')
+FILE_INFO = struct.Struct('6I') # csize, ucsize, doffset and three unknowns
+
+def parseFileTable(data):
+    # decodes the whole file name table at once into a list of paths and an array of csize, ucsize and doffset
+    paths = []
+    infos = array('I')
+    rfaEntries = FILE_NAME_LENGTH.unpack_from(data, 0)[0]
+    position = 4
+    for i in range(rfaEntries):
+        length = FILE_NAME_LENGTH.unpack_from(data, position)[0]
+        position += 4
+        paths.append(data[position:position+length].decode("utf-8", errors="ignore"))
+        position += length
+        infos.extend(FILE_INFO.unpack_from(data, position)[:3])
+        position += FILE_INFO.size
+    return paths, infos
+
+def fileKey(file):
+    # archives list their entries in case insensitive path order
+    return str.casefold(file.path)
+
+def normalizePath(path):
+    return path.lower().replace('\\', '/')
+
+def pathKey(path):
+    # index key of a path, already normalized paths are used as their own key instead of holding a second copy
+    key = normalizePath(path)
+    return path if key == path else key
+
+class RefractorFlatArchiveFileList(Sequence):
+    # read-only sequence of the entries of an archive, entries are created when accessed
+    def __init__(self, rfa):
+        self.rfa = rfa
+        self.values = list(rfa.fileIndex.values())
+    
+    def __len__(self):
+        return len(self.values)
+    
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.rfa.entry(value) for value in self.values[i]]
+        return self.rfa.entry(self.values[i])
+    
+    def __iter__(self):
+        return (self.rfa.entry(value) for value in self.values)
+
+class RefractorFlatArchiveReader(io.RawIOBase):
+    # raw file object over one entry of an archive, with its own mapping of the archive so it can outlive extractions
+    def __init__(self, rfa, file_info, cachedSegments = READER_CACHED_SEGMENTS):
+        self.rfa = rfa
+        self.size = file_info.ucsize
+        self.position = 0
+        self.cache = OrderedDict()
+        self.cachedSegments = cachedSegments
+        self.buffer = None
+        self.segments = None
+        if self.size == 0:
+            return
+        with open(rfa.path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if not rfa.compressed:
+            self.dataStart = file_info.doffset
+            return
+        self.dataStart, self.segments = rfa.readSegmentTable(file_info, self.buffer)
+        # uncompressed offset each segment starts at
+        self.starts = []
+        start = 0
+        for segment in self.segments:
+            self.starts.append(start)
+            start += segment[1]
+    
+    def readable(self):
+        return True
+    
+    def seekable(self):
+        return True
+    
+    def tell(self):
+        return self.position
+    
+    def seek(self, offset, whence = io.SEEK_SET):
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        elif whence != io.SEEK_SET:
+            raise ValueError('invalid whence (%r)' % whence)
+        if offset < 0:
+            raise ValueError('negative seek position %d' % offset)
+        self.position = offset
+        return self.position
+    
+    def segment(self, i):
+        # least recently used segments are dropped once more than cachedSegments are held
+        data = self.cache.get(i)
+        if data is None:
+            data = self.rfa.readSegment(self.dataStart, self.segments[i], self.buffer)
+            self.cache[i] = data
+            if len(self.cache) > self.cachedSegments:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(i)
+        return data
+    
+    def readinto(self, b):
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+        view = memoryview(b).cast('B')
+        length = max(0, min(len(view), self.size - self.position))
+        if self.segments is None:
+            if length:
+                view[:length] = self.buffer[self.dataStart+self.position:self.dataStart+self.position+length]
+            self.position += length
+            return length
+        done = 0
+        while done < length:
+            i = bisect_right(self.starts, self.position) - 1
+            offset = self.position - self.starts[i]
+            data = self.segment(i)
+            n = min(length - done, len(data) - offset)
+            if n <= 0:
+                break # segment shorter than its table says
+            view[done:done+n] = data[offset:offset+n]
+            done += n
+            self.position += n
+        return done
+    
+    def close(self):
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
+        self.cache.clear()
+        super().close()
+
 class RefractorFlatArchive:
-    def __init__(self, path, read = True):
+    def __init__(self, path, read = True, tocCache = None):
         self.path = path
+        self.tocCache = tocCache # optional RfaTocCache
         self.compressed = False
         self.success = False
-        self.fileList = []
+        self.parsed = False # header and table of contents could be read, even if the archive has no entries
+        self.tablePaths = [] # paths of the entries read from the archive
+        self.tableInfos = array('I') # csize, ucsize and doffset of each entry read from the archive
+        self.index = None # normalized path -> row in the table or RefractorFlatArchiveEntry, built on first use
         self.fileSize = None
+        self.buffer = None
         self.xpackHeaderId = None
         self.xpackHeaderIdName = None
         if read:
             self.read()
     
     def read(self):
+        self.tablePaths = []
+        self.tableInfos = array('I')
+        self.index = None
+        self.parsed = False
+        if self.tocCache != None and self.readCached():
+            return
         try:
             with open(self.path, 'rb') as f:
                 f.seek(0,2)
@@ -88,82 +296,199 @@ class RefractorFlatArchive:
                     self.xpackHeaderIdName = XpackHeaderIdNames.get(self.xpackHeaderId, False)
                 
                 f.seek(offset)
-                rfaEntries = read_i(f)
-                for i in range(rfaEntries):
-                    entryPath = read_s(f)
-                    file_info = RefractorFlatArchive_Info(f)
-                    unknowns = read_i(f,3)
-                    self.fileList.append(RefractorFlatArchiveEntry(entryPath, file_info=file_info))
-                    self.success = True
-        except: pass
+                self.tablePaths, self.tableInfos = parseFileTable(f.read())
+                self.parsed = True
+                self.success = len(self.tablePaths) > 0
+        except: return
+        if self.tocCache != None and self.success:
+            self.tocCache.store(self.path, self.compressed, self.xpackHeaderId, self.tablePaths, self.tableInfos)
+    
+    def readCached(self):
+        cached = self.tocCache.load(self.path)
+        if cached == None:
+            return False
+        self.compressed, self.xpackHeaderId, self.tablePaths, self.tableInfos = cached
+        self.xpackHeaderIdName = None if self.xpackHeaderId == None else XpackHeaderIdNames.get(self.xpackHeaderId, False)
+        self.fileSize = os.path.getsize(self.path)
+        self.parsed = True
+        self.success = len(self.tablePaths) > 0
+        return True
+    
+    @property
+    def fileIndex(self):
+        if self.index == None:
+            index = {}
+            for row, entryPath in enumerate(self.tablePaths):
+                index.setdefault(pathKey(entryPath), row) # the first of duplicate paths wins
+            self.index = index
+        return self.index
+    
+    def tableEntry(self, row):
+        file_info = RefractorFlatArchive_Info(None, *self.tableInfos[3*row:3*row+3])
+        return RefractorFlatArchiveEntry(self.tablePaths[row], file_info=file_info)
+    
+    def entry(self, value):
+        # entries read from the archive are only created when asked for
+        return self.tableEntry(value) if isinstance(value, int) else value
+    
+    def entryPath(self, value):
+        return self.tablePaths[value] if isinstance(value, int) else value.path
+    
+    def iterEntries(self):
+        return (self.entry(value) for value in self.fileIndex.values())
+    
+    @property
+    def fileList(self):
+        return RefractorFlatArchiveFileList(self)
     
     def getFileList(self):
-        return [file.path for file in self.fileList]
+        return [self.entryPath(value) for value in self.fileIndex.values()]
+    
+    def getEntry(self, path):
+        value = self.fileIndex.get(normalizePath(path))
+        return None if value == None else self.entry(value)
     
     def getCorrectFilePath(self, path):
-        for file in self.fileList:
-            if file.path.lower().replace('\\', '/') == path.lower().replace('\\', '/'):
-                return file.path
-        return None
+        value = self.fileIndex.get(normalizePath(path))
+        return None if value == None else self.entryPath(value)
+    
+    def addEntry(self, entry):
+        # replacing an entry moves it to the end, same as removing and appending it
+        key = normalizePath(entry.path)
+        self.fileIndex.pop(key, None)
+        self.fileIndex[key] = entry
+    
+    @contextmanager
+    def mapped(self):
+        # maps the archive into memory once, every extraction inside the block reads from the same mapping
+        if self.buffer is not None:
+            yield self.buffer
+            return
+        with open(self.path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield self.buffer
+        finally:
+            buffer, self.buffer = self.buffer, None
+            buffer.close()
     
-    def extractBlock(self, file_info, destinationPath = None, asBytes = False):
+    def readSegmentTable(self, file_info, buffer = None):
+        # returns the offset of the first segment and a (csize, ucsize, doffset) tuple per segment
+        buffer = self.buffer if buffer is None else buffer
+        segment_num = struct.unpack_from('I', buffer, file_info.doffset)[0]
+        table = struct.unpack_from('I'*3*segment_num, buffer, file_info.doffset+4)
+        return file_info.doffset+4+3*4*segment_num, [table[i:i+3] for i in range(0, len(table), 3)]
+    
+    def readSegment(self, dataStart, segment, buffer = None):
+        buffer = self.buffer if buffer is None else buffer
+        csize, ucsize, doffset = segment
+        if csize == 0 or ucsize == 0:
+            return b''
+        # lzo only accepts read-only buffers, slicing the mapping copies just the compressed bytes
+        return lzo.decompress(buffer[dataStart+doffset:dataStart+doffset+csize], False, ucsize)
+    
+    def readBlock(self, file_info, pool = None):
+        if not self.compressed:
+            return [self.buffer[file_info.doffset:file_info.doffset+file_info.ucsize]]
+        dataStart, segments = self.readSegmentTable(file_info)
+        if pool is not None:
+            return list(pool.map(lambda segment: self.readSegment(dataStart, segment), segments))
+        return [self.readSegment(dataStart, segment) for segment in segments]
+    
+    def extractBlock(self, file_info, destinationPath = None, asBytes = False, pool = None, createDirectory = True):
         self.success = False
         try:
-            with open(self.path, 'rb') as f:
-                data = []
-                f.seek(file_info.doffset)
-                if not self.compressed:
-                    data = [f.read(file_info.ucsize)]
-                else:
-                    segment_num = read_i(f)
-                    for i in range(segment_num):
-                        f.seek(file_info.doffset+4+3*4*i)
-                        segment_info = RefractorFlatArchive_Info(f)
-                        if segment_info.csize == 0 or segment_info.ucsize == 0:
-                            data.append(b'')
-                        else:
-                            f.seek(file_info.doffset+4+3*4*segment_num + segment_info.doffset)
-                            data_compressed = f.read(segment_info.csize)
-                            data.append(lzo.decompress(data_compressed, False, segment_info.ucsize))
-                if data != []:
-                    if destinationPath == None:
-                        self.success = True
-                        ret_str = b"" if asBytes else ""
-                        for data_segment in data: ret_str += data_segment if asBytes else data_segment.decode("utf-8", errors="ignore")
-                        return ret_str
-                    dir = os.path.dirname(destinationPath)
-                    if not os.path.exists(dir):
-                        os.makedirs(dir)
-                    with open(destinationPath, 'wb') as fout:
-                        fout.truncate()
-                        self.success = True
-                        for data_segment in data:
-                            fout.write(data_segment)
+            with self.mapped():
+                data = self.readBlock(file_info, pool)
+            if destinationPath == None:
+                self.success = True
+                data = b''.join(data)
+                return data if asBytes else data.decode("utf-8", errors="ignore")
+            dir = os.path.dirname(destinationPath)
+            if dir and createDirectory:
+                os.makedirs(dir, exist_ok=True)
+            with open(destinationPath, 'wb') as fout:
+                self.success = True
+                for data_segment in data:
+                    fout.write(data_segment)
         except: pass
         return False
     
-    def extractAll(self, destinationDir = None):
-        for file in self.fileList:
-            destinationPath = file.path if destinationDir == None else os.path.join(destinationDir, file.path)
-            self.extractBlock(file.file_info, destinationPath)
+    def extractAll(self, destinationDir = None, workers = None):
+        self.extractEntries(self.destinations(self.iterEntries(), destinationDir), workers)
+    
+    def extractMany(self, paths, destinationDir = None, workers = None):
+        # resolves every path first and extracts in archive order so the reads are sequential
+        # returns the paths that are not in the archive
+        files = []
+        missing = []
+        for path in paths:
+            file = self.getEntry(path)
+            if file is None or file.file_info is None:
+                missing.append(path)
+            else:
+                files.append(file)
+        files.sort(key=lambda file: file.file_info.doffset)
+        self.extractEntries(self.destinations(files, destinationDir), workers)
+        return missing
+    
+    def destinations(self, files, destinationDir = None):
+        return ((file, file.path if destinationDir == None else os.path.join(destinationDir, file.path)) for file in files)
+    
+    def extractEntries(self, targets, workers = None, createDirectories = True):
+        # extracts (entry, destination path) pairs, createDirectories can be turned off when every destination directory exists
+        with self.mapped():
+            if workers is None or workers <= 1:
+                for file, destinationPath in targets:
+                    self.extractBlock(file.file_info, destinationPath, createDirectory=createDirectories)
+                return
+            
+            # lzo releases the GIL while (de)compressing, so threads are enough to keep every core busy
+            with ThreadPoolExecutor(workers) as pool:
+                futures = []
+                for file, destinationPath in targets:
+                    if self.compressed and file.file_info.ucsize >= PARALLEL_SEGMENTS_MIN * MAX_SEGMENT_SIZE:
+                        # large files are split over the pool segment by segment and written from this thread
+                        self.extractBlock(file.file_info, destinationPath, pool=pool, createDirectory=createDirectories)
+                    else:
+                        futures.append(pool.submit(self.extractBlock, file.file_info, destinationPath, createDirectory=createDirectories))
+                for future in futures:
+                    future.result()
 
     def extractFile(self, path, destinationDir = None, asString = False):
-        path = self.getCorrectFilePath(path)
-        destinationPath = path if destinationDir == None else os.path.join(destinationDir, path)
-        for file in self.fileList:
-            if file.path == path:
-                return self.extractBlock(file.file_info, None if asString else destinationPath)
-        return False
+        file = self.getEntry(path)
+        if file is None:
+            return False
+        destinationPath = file.path if destinationDir == None else os.path.join(destinationDir, file.path)
+        return self.extractBlock(file.file_info, None if asString else destinationPath)
+    
+    def open(self, path):
+        # returns a seekable read-only binary file object, only the segments that are read get decompressed
+        file = self.getEntry(path)
+        if file is None:
+            raise FileNotFoundError(path)
+        if file.is_string:
+            return io.BytesIO(file.file_contents.encode())
+        if file.is_external:
+            return open(file.external_filepath, 'rb')
+        return io.BufferedReader(RefractorFlatArchiveReader(self, file.file_info), MAX_SEGMENT_SIZE)
+    
+    def readRange(self, path, offset, length):
+        # returns up to length bytes from offset, only the segments covering the range are decompressed
+        file = self.getEntry(path)
+        if file is None:
+            raise FileNotFoundError(path)
+        with self.open(path) if file.is_external else RefractorFlatArchiveReader(self, file.file_info) as f:
+            f.seek(offset)
+            return f.read(length)
     
     def addFile(self, filePath, base_directory):
         relativePath = os.path.relpath(filePath, base_directory).replace('\\', '/')
-        self.removeFile(relativePath)
-        self.fileList.append(RefractorFlatArchiveEntry(relativePath, is_external=True, external_filepath=filePath))
+        self.addEntry(RefractorFlatArchiveEntry(relativePath, is_external=True, external_filepath=filePath))
         
     def addFileAsString(self, relativePath, contents):
         relativePath = relativePath.replace('\\', '/')
-        self.removeFile(relativePath)
-        self.fileList.append(RefractorFlatArchiveEntry(relativePath, is_external=True, is_string=True, file_contents=contents))
+        self.addEntry(RefractorFlatArchiveEntry(relativePath, is_external=True, is_string=True, file_contents=contents))
     
     def addDirectory(self, directory, base_directory = None):
         if base_directory == None: base_directory = directory
@@ -172,130 +497,442 @@ class RefractorFlatArchive:
             self.addFile(file, base_directory)
         
     def removeFile(self, filePath):
-        filePathCorrected = self.getCorrectFilePath(filePath)
-        if filePathCorrected is None:
-            return False
-        for file in self.fileList:
-            if file.path == filePathCorrected:
-                self.fileList.remove(file)
-                break
-        return True
+        return self.fileIndex.pop(normalizePath(filePath), None) is not None
     
     def deleteAllNonServerFiles(self):
-        for i in reversed(range(len(self.fileList))):
-            filePath = self.fileList[i].path
+        for key, value in list(self.fileIndex.items()):
+            filePath = self.entryPath(value)
             if os.path.splitext(filePath)[1].lower() in ['.bik', '.dds', '.tga', 'wav'] or os.path.basename(filePath).lower() in ['palette.pal', 'envmap_g_.rcm', 'lightmapshadowbits.lsb', 'terrainpalette.pal', 'textureprecache.dat']:
-                self.fileList.pop(i)
+                del self.fileIndex[key]
+    
+    def iterSource(self, file):
+        # yields the contents of a file to write in chunks of at most MAX_SEGMENT_SIZE, preceded by the file size
+        if file.is_external and file.is_string:
+            fileBytes = bytes(file.file_contents, "UTF-8")
+            yield len(fileBytes)
+            for i in range(0, len(fileBytes), MAX_SEGMENT_SIZE):
+                yield fileBytes[i:i+MAX_SEGMENT_SIZE]
+        elif file.is_external:
+            with open(file.external_filepath, "rb") as f_source:
+                yield os.fstat(f_source.fileno()).st_size
+                while True:
+                    block = f_source.read(MAX_SEGMENT_SIZE)
+                    if not block:
+                        break
+                    yield block
+        elif not self.compressed: # internal RFA file
+            file_info = file.file_info
+            yield file_info.ucsize
+            for i in range(file_info.doffset, file_info.doffset+file_info.ucsize, MAX_SEGMENT_SIZE):
+                yield self.buffer[i:min(i+MAX_SEGMENT_SIZE, file_info.doffset+file_info.ucsize)]
+        else:
+            yield file.file_info.ucsize
+            dataStart, segments = self.readSegmentTable(file.file_info)
+            yield from rechunk((self.readSegment(dataStart, segment) for segment in segments), MAX_SEGMENT_SIZE)
+    
+    def storedSize(self, file_info):
+        # size of the entry as stored in the archive, including the segment table
+        if not self.compressed:
+            return file_info.ucsize
+        dataStart, segments = self.readSegmentTable(file_info)
+        return dataStart - file_info.doffset + max((doffset + csize for csize, ucsize, doffset in segments), default=0)
+    
+    def iterStored(self, file):
+        # yields the stored bytes of an internal file in chunks of at most MAX_SEGMENT_SIZE, preceded by their size
+        storedSize = self.storedSize(file.file_info)
+        yield storedSize
+        for i in range(file.file_info.doffset, file.file_info.doffset+storedSize, MAX_SEGMENT_SIZE):
+            yield self.buffer[i:min(i+MAX_SEGMENT_SIZE, file.file_info.doffset+storedSize)]
+    
+    def hashSource(self, file, stored):
+        source = self.iterStored(file) if stored else self.iterSource(file)
+        fileSize = next(source)
+        sha256 = hashlib.sha256(usedforsecurity=False)
+        for block in source:
+            sha256.update(block)
+        return stored, fileSize, sha256.digest()
     
-    def write(self, destPath = None, compressed = True):
+    def iterSegments(self, files, compressed, deduplicate = False, recompress = False):
+        # yields (file, segment index, segment count, segment, stored, original) for every segment to write, in order
+        # unmodified internal files are stored as they are, segment table included, unless recompress is set
+        # duplicates of a file written earlier yield a single item pointing at the original instead of any segments
+        originals = {}
+        for file in files:
+            try:
+                stored = not file.is_external and self.compressed == compressed and not recompress
+                if deduplicate:
+                    original = originals.setdefault(self.hashSource(file, stored), file)
+                    if original is not file:
+                        yield file, 0, 0, b'', stored, original
+                        continue
+                source = self.iterStored(file) if stored else self.iterSource(file)
+                fileSize = next(source)
+                segmentCount = (fileSize + MAX_SEGMENT_SIZE - 1) // MAX_SEGMENT_SIZE
+                if segmentCount == 0:
+                    yield file, 0, 0, b'', stored, None
+                for i in range(segmentCount):
+                    # always produce the announced number of segments, even if the source changed size meanwhile
+                    yield file, i, segmentCount, next(source, b''), stored, None
+            except Exception as e:
+                # a missing entry would silently drop every entry after it, the write fails instead
+                raise OSError("cant open: "+(file.external_filepath if file.is_external else file.path+" in RFA")) from e
+    
+    def write(self, destPath = None, compressed = True, workers = None, deduplicate = False, compression = None, recompress = False):
+        # compression only applies to added entries, entries read from the archive are copied as they are stored
+        # unless recompress is set, then they are decompressed and compressed again following compression
         overWriteSelf = destPath == None
-        if destPath == None: destPath = self.path+"tmp"
+        if destPath == None: destPath = str(self.path)+"tmp"
         
-        def file_key(file):
-            return str.casefold(file.path)
+        files = sorted(self.iterEntries(), key=fileKey)
+        hasInternalFiles = any(not file.is_external for file in files)
+        pool = ThreadPoolExecutor(workers) if workers is not None and workers > 1 else None
         
-        with open(destPath, "wb") as f:
-            # write header
-            write_i(f, 0) # size (4bytes), pre-fill
-            write_i(f, 1 if compressed else 0) # compressed (4bytes)
-            randomBytesSring = "Refractor Flat Archive Packed with Arkylien's Python Module on "+datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            randomBytes = bytes(randomBytesSring, 'utf-8') + b'\x00'*(143-len(randomBytesSring))
-            write_bytes(f, randomBytes)
-            write_bytes(f, b'\x00') # unusedByte
-            write_i(f, (self.xpackHeaderId if self.xpackHeaderId != None else 0x48128321) + sum(randomBytes)) # xpackHeaderId
-            
-            self.fileList.sort(key=file_key)
+        try:
+            with pool or nullcontext(), self.mapped() if hasInternalFiles else nullcontext(), open(destPath, "wb") as f:
+                # write header
+                write_i(f, 0) # size (4bytes), pre-fill
+                write_i(f, 1 if compressed else 0) # compressed (4bytes)
+                randomBytesSring = "Refractor Flat Archive Packed with Arkylien's Python Module on "+datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                randomBytes = bytes(randomBytesSring, 'utf-8') + b'\x00'*(143-len(randomBytesSring))
+                write_bytes(f, randomBytes)
+                write_bytes(f, b'\x00') # unusedByte
+                write_i(f, (self.xpackHeaderId if self.xpackHeaderId != None else 0x48128321) + sum(randomBytes)) # xpackHeaderId
+                
+                file_infos = self.writeEntries(f, files, compressed, pool, 4*workers if pool else 1, deduplicate, compression, recompress)
+                startFileList = self.writeFileTable(f, file_infos)
+                
+                # rewrite offset
+                f.seek(0)
+                write_i(f, startFileList)
+        except BaseException:
+            # a partially written archive is removed, an archive overwriting itself is left as it was
+            if os.path.exists(destPath):
+                os.remove(destPath)
+            raise
+        
+        if overWriteSelf:
+            os.replace(destPath, self.path)
+            # entries now live at new offsets in the replaced archive
+            self.read()
+    
+    def patch(self, workers = None, compression = None):
+        # writes the data of added and replaced entries after the end of the archive, followed by a new table of contents
+        # the header is pointed at the new table last, so the archive stays readable if patching is interrupted
+        # data of replaced and removed entries is left behind as dead space, compact reclaims it
+        files = sorted(self.iterEntries(), key=fileKey)
+        changed = [file for file in files if file.is_external]
+        pool = ThreadPoolExecutor(workers) if workers is not None and workers > 1 else None
+        
+        with pool or nullcontext(), open(self.path, "r+b") as f:
+            # v 1.1 archives store the offset of the table after an additional string of 28 bytes
+            offsetPosition = 28 if self.fileSize >= 28 and read_s(f, 28) == "Refractor2 FlatArchive 1.1  " else 0
+            f.seek(0, 2)
+            written = iter(self.writeEntries(f, changed, self.compressed, pool, 4*workers if pool else 1, compression=compression))
+            file_infos = [next(written) if file.is_external else (file.path, file.file_info) for file in files]
+            startFileList = self.writeFileTable(f, file_infos)
+            f.flush()
+            os.fsync(f.fileno())
             
-            file_infos = []
-            # write file_blocks
-            for file in self.fileList:
-                if file.is_external:
-                    if file.is_string:
-                        fileBytes = bytes(file.file_contents, "UTF-8")
-                    else:
-                        try:
-                            with open(file.external_filepath, "rb") as f_source:
-                                fileBytes = f_source.read()
-                        except:
-                            print("cant open: "+file.external_filepath)
-                            break
-                else: # internal RFA file
-                    fileBytes = self.extractBlock(file.file_info, asBytes = True)
-                    if fileBytes == False:
-                        print("cant open: "+file.path+" in RFA")
-                        break
+            f.seek(offsetPosition)
+            write_i(f, startFileList)
+        
+        # patched entries now live in the archive
+        self.read()
+    
+    def compact(self, workers = None, deduplicate = False, compression = None, recompress = False):
+        # rewrites the archive without the dead space left by patch, stored data is copied without recompressing it
+        # unless recompress is set, then every entry is compressed again following compression
+        self.write(compressed=self.compressed, workers=workers, deduplicate=deduplicate, compression=compression, recompress=recompress)
+    
+    def writeEntries(self, f, files, compressed, pool = None, window = 1, deduplicate = False, compression = None, recompress = False):
+        # writes the data of files at the current position of f, returns a (path, info) tuple per file
+        # window is the number of segments the pool compresses ahead
+        if compression == None: compression = CompressionPolicy()
+        if isinstance(compression, int): compression = CompressionPolicy(compression)
+        
+        def compress(segment):
+            file, index, segmentCount, block, stored = segment[:5]
+            return compression.compress(block, compression.getLevel(file.path)) if compressed and not stored else block
+        
+        file_infos = []
+        # write file_blocks, segments of upcoming files are compressed by the pool while finished ones are written in order
+        writtenInfos = {}
+        segments = self.iterSegments(files, compressed, deduplicate, recompress)
+        for segment, fileBytesCompressed in orderedMap(pool, compress, segments, window):
+            file, index, segmentCount, fileBytesBlock, stored, original = segment
+            if original is not None:
+                # identical contents are only stored once, the duplicate shares its data
+                info = writtenInfos[original]
+                file_infos.append((file.path, RefractorFlatArchive_Info(None, info.csize, info.ucsize, info.doffset)))
+                continue
+            if index == 0:
                 dataOffset = f.tell()
-                if not compressed: # not compressed
-                    f.write(fileBytes)
-                    csize = len(fileBytes)
-                else:
-                    maxSegmentSize = 32768
-                    fileBytesBlocks = [fileBytes[i:min(i + maxSegmentSize, len(fileBytes))] for i in range(0, len(fileBytes), maxSegmentSize)]
-                    write_i(f, len(fileBytesBlocks)) # number of segments
-                    write_i(f, [0]*len(fileBytesBlocks)*3) # segments header pre-fill
+                fileSize = 0
+                if compressed and not stored:
+                    write_i(f, segmentCount) # number of segments
+                    write_i(f, [0]*segmentCount*3) # segments header pre-fill
                     startDataBlocks = f.tell()
                     segmentInfos = []
-                    csize = len(fileBytesBlocks)*3*4+4
-                    for fileBytesBlock in fileBytesBlocks:
-                        fileBytesCompressed = lzo.compress(fileBytesBlock, 9, False) # compression level = 9, Include metadata header = False
-                        segmentInfos.append(RefractorFlatArchive_Info(None, len(fileBytesCompressed), len(fileBytesBlock), f.tell()-startDataBlocks))
-                        f.write(fileBytesCompressed)
-                        csize += len(fileBytesCompressed)
-                    endDataBlocks = f.tell()
-                    f.seek(dataOffset+4)
-                    for segmentInfo in segmentInfos:
-                        segmentInfo.write(f)
-                    f.seek(endDataBlocks)
-                file_infos.append((file.path, RefractorFlatArchive_Info(None, csize, len(fileBytes), dataOffset)))
-            
-            startFileList = f.tell()
-            
-            # write file_name_info_list
-            write_i(f, len(file_infos)) # number of files
-            for file_info in file_infos:
-                write_s(f, file_info[0]) # filePath
-                file_info[1].write(f)
-                write_i(f, [0, 0, 0]) # unknowns
-            
-            # write eof
-            write_i(f, 0)
-            
-            # rewrite offset
-            f.seek(0)
-            write_i(f, startFileList)
+            if compressed and not stored and segmentCount > 0:
+                segmentInfos.append(RefractorFlatArchive_Info(None, len(fileBytesCompressed), len(fileBytesBlock), f.tell()-startDataBlocks))
+                f.write(fileBytesCompressed)
+            elif not compressed or stored: # not compressed or stored as is
+                f.write(fileBytesCompressed)
+            fileSize += len(fileBytesBlock)
+            if index < segmentCount - 1:
+                continue
+            # last segment of the file
+            csize = f.tell() - dataOffset
+            if stored:
+                fileSize = file.file_info.ucsize
+            elif compressed:
+                endDataBlocks = f.tell()
+                f.seek(dataOffset+4)
+                for segmentInfo in segmentInfos:
+                    segmentInfo.write(f)
+                f.seek(endDataBlocks)
+            file_infos.append((file.path, RefractorFlatArchive_Info(None, csize, fileSize, dataOffset)))
+            if deduplicate:
+                writtenInfos[file] = file_infos[-1][1]
+        return file_infos
+    
+    def writeFileTable(self, f, file_infos):
+        # writes the table of contents at the current position of f, returns its offset
+        startFileList = f.tell()
         
-        if overWriteSelf:
-            os.replace(destPath, self.path)
+        # write file_name_info_list
+        write_i(f, len(file_infos)) # number of files
+        for file_info in file_infos:
+            write_s(f, file_info[0]) # filePath
+            file_info[1].write(f)
+            write_i(f, [0, 0, 0]) # unknowns
+        
+        # write eof
+        write_i(f, 0)
+        return startFileList
+    
+    def compressionReport(self, levels = (COMPRESSION_STORE, COMPRESSION_FAST, COMPRESSION_BEST)):
+        # compresses every file at each level without writing anything
+        # returns {extension: {'files': count, 'size': uncompressed size, level: [compressed size, seconds]}}
+        report = {}
+        policy = CompressionPolicy()
+        files = list(self.iterEntries())
+        with self.mapped() if any(not file.is_external for file in files) else nullcontext():
+            for file in files:
+                extension = os.path.splitext(file.path)[1].lower()
+                if extension not in report:
+                    report[extension] = {'files': 0, 'size': 0}
+                    report[extension].update({level: [0, 0.0] for level in levels})
+                stats = report[extension]
+                stats['files'] += 1
+                source = self.iterSource(file)
+                next(source)
+                for block in source:
+                    stats['size'] += len(block)
+                    for level in levels:
+                        start = time.perf_counter()
+                        stats[level][0] += len(policy.compress(block, level))
+                        stats[level][1] += time.perf_counter() - start
+        return report
+    
+    def verifyEntry(self, file, hashes = None):
+        # returns the problems found with an entry read from the archive, empty if it is intact
+        # with hashes, the stored bytes are compared to their recorded sha256 instead of being decompressed
+        info = file.file_info
+        if not self.compressed:
+            if info.doffset + info.ucsize > self.fileSize:
+                return ['data ends past the end of the archive']
+            storedSize = info.ucsize
+        else:
+            if info.doffset + 4 > self.fileSize:
+                return ['segment table starts past the end of the archive']
+            segment_num = struct.unpack_from('I', self.buffer, info.doffset)[0]
+            if info.doffset + 4 + 3*4*segment_num > self.fileSize:
+                return ['segment table of %d segments ends past the end of the archive' % segment_num]
+            dataStart, segments = self.readSegmentTable(info)
+            problems = []
+            ucsize = sum(segment[1] for segment in segments)
+            if ucsize != info.ucsize:
+                problems.append('segments hold %d bytes, the table of contents %d' % (ucsize, info.ucsize))
+            end = max((doffset + csize for csize, _, doffset in segments), default=0)
+            if dataStart + end > self.fileSize:
+                return problems + ['segment data ends past the end of the archive']
+            if dataStart - info.doffset + end > info.csize:
+                problems.append('segment data ends past the stored size of %d bytes' % info.csize)
+            if problems:
+                return problems
+            storedSize = dataStart - info.doffset + end
+        if hashes is not None:
+            expected = hashes.get(file.path)
+            if expected is None:
+                return ['no recorded hash']
+            if hashlib.sha256(self.buffer[info.doffset:info.doffset+storedSize], usedforsecurity=False).hexdigest() != expected:
+                return ['stored bytes do not match the recorded hash']
+            return []
+        if not self.compressed:
+            return []
+        for i, segment in enumerate(segments):
+            try:
+                data = self.readSegment(dataStart, segment)
+            except Exception as e:
+                problems.append('segment %d does not decompress: %s' % (i, e))
+                continue
+            if len(data) != segment[1]:
+                problems.append('segment %d decompresses to %d bytes instead of %d' % (i, len(data), segment[1]))
+        return problems
+    
+    def verify(self, workers = None, progress = None, hashes = None):
+        # checks every entry, returns a (path, problem) tuple per problem found
+        # progress is called with the number of entries checked and the total after each entry
+        if not self.parsed:
+            return [(None, 'header or table of contents could not be read')]
+        files = sorted((file for file in self.iterEntries() if file.file_info is not None), key=lambda file: file.file_info.doffset)
+        problems = []
+        pool = ThreadPoolExecutor(workers) if workers is not None and workers > 1 else None
+        with pool or nullcontext(), self.mapped():
+            checked = orderedMap(pool, lambda file: self.verifyEntry(file, hashes), files, 4*workers if pool else 1)
+            for done, (file, fileProblems) in enumerate(checked, 1):
+                problems += [(file.path, problem) for problem in fileProblems]
+                if progress is not None:
+                    progress(done, len(files))
+        return problems
+    
+    def storedHashes(self, workers = None):
+        # sha256 of the stored bytes of every entry read from the archive, keyed by path
+        pool = ThreadPoolExecutor(workers) if workers is not None and workers > 1 else None
+        with pool or nullcontext(), self.mapped():
+            hashed = orderedMap(pool, lambda file: self.hashSource(file, True), (file for file in self.iterEntries() if file.file_info is not None), 4*workers if pool else 1)
+            return {file.path: digest.hex() for file, (stored, fileSize, digest) in hashed}
+    
+    def diff(self, other, workers = None):
+        # returns the paths added in other, removed from it and changed in it, compared to this archive
+        index = self.fileIndex
+        otherIndex = other.fileIndex
+        added = sorted(other.entryPath(value) for key, value in otherIndex.items() if key not in index)
+        removed = sorted(self.entryPath(value) for key, value in index.items() if key not in otherIndex)
+        pairs = [(self, self.entry(value), other, other.entry(otherIndex[key])) for key, value in index.items() if key in otherIndex]
+        return added, removed, diffEntries(pairs, workers)
+
+def rechunk(blocks, size):
+    # regroups a stream of byte blocks into blocks of exactly size bytes, except for the last one
+    pending = bytearray()
+    for block in blocks:
+        if not pending and len(block) == size:
+            yield block
+            continue
+        pending += block
+        while len(pending) >= size:
+            yield bytes(pending[:size])
+            del pending[:size]
+    if pending:
+        yield bytes(pending)
+
+def diffEntries(pairs, workers = None):
+    # returns the sorted paths of the (archive, entry, other archive, other entry) pairs whose contents differ
+    # entries whose sizes differ are changed without reading them, entries stored the same way with identical stored bytes are
+    # unchanged without decompressing them, only the remaining entries are decompressed and hashed
+    def differs(pair):
+        rfa, file, other, otherFile = pair
+        internal = file.file_info is not None and otherFile.file_info is not None
+        if internal and file.file_info.ucsize != otherFile.file_info.ucsize:
+            return True
+        if internal and rfa.compressed == other.compressed and (not rfa.compressed or file.file_info.csize == otherFile.file_info.csize):
+            if rfa.hashSource(file, True) == other.hashSource(otherFile, True):
+                return False
+            if not rfa.compressed:
+                return True
+        return rfa.hashSource(file, False)[1:] != other.hashSource(otherFile, False)[1:]
+    
+    pool = ThreadPoolExecutor(workers) if workers is not None and workers > 1 else None
+    with pool or nullcontext(), ExitStack() as stack:
+        for rfa in set(rfa for pair in pairs for rfa, file in (pair[0:2], pair[2:4]) if file.file_info is not None):
+            stack.enter_context(rfa.mapped())
+        return sorted(pair[1].path for pair, changed in orderedMap(pool, differs, pairs, 4*workers if pool else 1) if changed)
+
+def orderedMap(pool, fn, items, window):
+    # like pool.map, but consumes items lazily and keeps at most window of them in flight
+    if pool is None:
+        for item in items:
+            yield item, fn(item)
+        return
+    pending = deque()
+    for item in items:
+        pending.append((item, pool.submit(fn, item)))
+        if len(pending) >= window:
+            item, future = pending.popleft()
+            yield item, future.result()
+    while pending:
+        item, future = pending.popleft()
+        yield item, future.result()
             
 class RefractorFlatArchiveGroup:
-    def __init__(self, rfas = None):
-        self.rfas = [] if rfas == None else [RefractorFlatArchive(path) for path in rfas]
+    def __init__(self, rfas = None, tocCache = None):
+        self.rfas = [] if rfas == None else [RefractorFlatArchive(path, tocCache=tocCache) for path in rfas]
+        self.buildIndex()
+    
+    def buildIndex(self):
+        # normalized path -> row << 16 | archive number for rows of an archive's table, (archive, entry) for added entries
+        # the first archive containing a path wins, rebuild after changing rfas or the entries of one of them
+        self.fileIndex = {}
+        for number, rfa in enumerate(self.rfas):
+            if rfa.index == None:
+                # untouched archives are indexed straight from their table, without building their own index
+                for row, entryPath in enumerate(rfa.tablePaths):
+                    self.fileIndex.setdefault(pathKey(entryPath), row << 16 | number)
+                continue
+            for key, value in rfa.fileIndex.items():
+                self.fileIndex.setdefault(key, value << 16 | number if isinstance(value, int) else (rfa, value))
+    
+    def resolve(self, value):
+        # returns the archive and the value in its fileIndex for a value of the group's fileIndex
+        if value == None:
+            return None, None
+        if isinstance(value, int):
+            return self.rfas[value & 0xffff], value >> 16
+        return value
+    
+    def getEntry(self, path):
+        rfa, value = self.resolve(self.fileIndex.get(normalizePath(path)))
+        return rfa, None if rfa == None else rfa.entry(value)
         
     def extractFile(self, path, destinationDir = None, asString = False):
-        for rfa in self.rfas:
-            filePathInRFA = rfa.getCorrectFilePath(path)
-            if filePathInRFA != None:
-                return(rfa.extractFile(filePathInRFA, destinationDir, asString))
+        rfa, file = self.getEntry(path)
+        if rfa != None:
+            return(rfa.extractFile(file.path, destinationDir, asString))
         return False
     
+    def extractMany(self, paths, destinationDir = None, workers = None):
+        # returns the paths that are in none of the archives
+        archivePaths = {}
+        missing = []
+        for path in paths:
+            rfa, value = self.resolve(self.fileIndex.get(normalizePath(path)))
+            if rfa == None:
+                missing.append(path)
+            else:
+                archivePaths.setdefault(rfa, []).append(path)
+        for rfa, rfaPaths in archivePaths.items():
+            missing += rfa.extractMany(rfaPaths, destinationDir, workers)
+        return missing
+    
     def getFileList(self):
-        filePathList = []
-        for rfa in self.rfas:
-            for file in rfa.fileList:
-                if not file.path.lower() in (path.lower() for path in filePathList):
-                    filePathList.append(file.path)
-        return filePathList
+        return [rfa.entryPath(value) for rfa, value in map(self.resolve, self.fileIndex.values())]
+    
+    def diff(self, other, workers = None):
+        # returns the paths added in other, removed from it and changed in it, compared to this group
+        added = sorted(other.getCorrectFilePath(key) for key in other.fileIndex if key not in self.fileIndex)
+        removed = sorted(self.getCorrectFilePath(key) for key in self.fileIndex if key not in other.fileIndex)
+        pairs = []
+        for key, value in self.fileIndex.items():
+            if key in other.fileIndex:
+                rfa, file = self.getEntry(key)
+                otherRfa, otherFile = other.getEntry(key)
+                pairs.append((rfa, file, otherRfa, otherFile))
+        return added, removed, diffEntries(pairs, workers)
         
     def fileExists(self, path):
-        for rfa in self.rfas:
-            filePathInRFA = rfa.getCorrectFilePath(path)
-            if filePathInRFA != None:
-                return True
-        return False
+        return normalizePath(path) in self.fileIndex
     
     def getCorrectFilePath(self, path):
-        for rfa in self.rfas:
-            filePathInRFA = rfa.getCorrectFilePath(path)
-            if filePathInRFA != None:
-                return filePathInRFA
-        return None
+        rfa, value = self.resolve(self.fileIndex.get(normalizePath(path)))
+        return None if rfa == None else rfa.entryPath(value)
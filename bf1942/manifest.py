@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+MANIFEST_SUFFIX = '.manifest'
+MANIFEST_VERSION = 1
+HASHES_SUFFIX = '.sha256'
+HASHES_VERSION = 1
+
+def manifest_path(rfa_path):
+    rfa_path = Path(rfa_path)
+    return rfa_path.with_name(rfa_path.name + MANIFEST_SUFFIX)
+
+def compute_file_hash(path):
+    sha256 = hashlib.sha256(usedforsecurity=False)
+
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            sha256.update(block)
+
+    return sha256.hexdigest()
+
+def read_manifest(rfa_path, options=None):
+    '''Read the source manifest stored next to an RFA, None if it is missing or does not describe the RFA as it is on disk.
+
+    If options are given, the manifest is also None if the RFA was packed with other pack options.
+    '''
+
+    try:
+        with open(manifest_path(rfa_path)) as file:
+            manifest = json.load(file)
+        stat = os.stat(rfa_path)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('archive') != [stat.st_size, stat.st_mtime_ns]:
+        return None
+
+    if options is not None and manifest.get('options') != options:
+        return None
+
+    return manifest['files']
+
+def write_manifest(rfa_path, files, options=None):
+    stat = os.stat(rfa_path)
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'archive': [stat.st_size, stat.st_mtime_ns],
+        'options': options,
+        'files': files
+    }
+
+    with open(manifest_path(rfa_path), 'w') as file:
+        json.dump(manifest, file, indent=0, sort_keys=True)
+
+def scan_sources(src, base, previous=None):
+    '''Record size, mtime and hash of every file below src, keyed by RFA entry path.
+
+    Files with the same size and mtime as in the previous manifest keep their recorded hash instead of being read again.
+    '''
+
+    previous = {} if previous is None else previous
+    files = {}
+    paths = {}
+
+    for root, dirs, filenames in os.walk(src):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            entry = os.path.relpath(path, base).replace('\\', '/')
+            stat = os.stat(path)
+            known = previous.get(entry)
+
+            if known is not None and known[0:2] == [stat.st_size, stat.st_mtime_ns]:
+                files[entry] = known
+            else:
+                files[entry] = [stat.st_size, stat.st_mtime_ns, compute_file_hash(path)]
+            paths[entry] = path
+
+    return files, paths
+
+def compare_manifests(previous, current):
+    '''Return the entries that were added or whose contents changed, and the entries that were removed.'''
+
+    changed = [entry for entry in current if entry not in previous or previous[entry][2] != current[entry][2]]
+    removed = [entry for entry in previous if entry not in current]
+
+    return changed, removed
+
+def hashes_path(rfa_path):
+    rfa_path = Path(rfa_path)
+    return rfa_path.with_name(rfa_path.name + HASHES_SUFFIX)
+
+def read_hashes(rfa_path):
+    '''Read the archive size and the stored entry hashes recorded next to an RFA, None if they are missing.
+
+    Unlike manifests, recorded hashes are not discarded when the RFA changes, they exist to detect such changes.
+    '''
+
+    try:
+        with open(hashes_path(rfa_path)) as file:
+            hashes = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    if hashes.get('version') != HASHES_VERSION:
+        return None
+
+    return hashes['size'], hashes['entries']
+
+def write_hashes(rfa_path, size, entries):
+    hashes = {
+        'version': HASHES_VERSION,
+        'size': size,
+        'entries': entries
+    }
+
+    with open(hashes_path(rfa_path), 'w') as file:
+        json.dump(hashes, file, indent=0, sort_keys=True)
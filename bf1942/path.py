@@ -1,31 +1,98 @@
+import os
 from pathlib import Path
 
-def path_join_insensitive(base, path):
-    path = Path(path)
-    result = Path(base)
+class PathResolver:
+    '''Joins paths case insensitively like path_join_insensitive, reading each directory listing only once.
 
-    if not result.exists():
-        return result / path
-        
-    for index, part in enumerate(path.parts):
-        dirs = [d for d in result.iterdir() if d.is_dir()]
+    Listings are cached until invalidated, directories created through mkdir invalidate their parent. Directories
+    changed by other means need an explicit invalidate call.
+    '''
 
-        # exact match
-        if part in [d.name for d in dirs]:
-            result /= part
-            continue
+    def __init__(self):
+        self.listings = {}
 
-        candidates = [d.name for d in dirs if d.name.lower() == part.lower()]
+    def listing(self, directory):
+        '''Return the names of the subdirectories of directory and a map of their lowercase names to the first of them.'''
 
-        if len(candidates) > 0:
-            # one or more candidates, pick first
-            result /= candidates[0]
+        directory = Path(directory)
+        listing = self.listings.get(directory)
+
+        if listing is None:
+            names = set()
+            lower = {}
+
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir():
+                            names.add(entry.name)
+                            lower.setdefault(entry.name.lower(), entry.name)
+            except OSError:
+                pass
+
+            listing = self.listings[directory] = (names, lower)
+
+        return listing
+
+    def resolve_part(self, directory, part):
+        names, lower = self.listing(directory)
+
+        # exact match first, then the first candidate differing in case only
+        if part in names:
+            return part
+
+        return lower.get(part.lower())
+
+    def join(self, base, path):
+        return self.join_many(base, [path])[0]
+
+    def join_many(self, base, paths):
+        '''Join every path to base in a single traversal, each distinct directory below base is resolved once.'''
+
+        base = Path(base)
+        resolved = {(): (base, True)}
+        results = []
+
+        for path in paths:
+            parts = Path(path).parts
+            result, found = base, True
+
+            for index, part in enumerate(parts):
+                prefix = parts[:index + 1]
+                known = resolved.get(prefix)
+
+                if known is None:
+                    name = self.resolve_part(result, part)
+                    known = resolved[prefix] = (result / name, True) if name is not None else (result / part, False)
+
+                result, found = known
+
+                if not found:
+                    # no candidates, no point in continuing walk, concat rest and bail
+                    result = result.joinpath(*parts[index + 1:])
+                    break
+
+            results.append(result)
+
+        return results
+
+    def mkdir(self, path, parents=False, exist_ok=False):
+        path = Path(path)
+        path.mkdir(parents=parents, exist_ok=exist_ok)
+
+        for parent in path.parents:
+            self.invalidate(parent)
+
+    def invalidate(self, directory=None):
+        '''Forget the listing of directory, or every listing if directory is None.'''
+
+        if directory is None:
+            self.listings.clear()
         else:
-            # no candidates, no point in continuing walk, concat rest and bail
-            result /= Path(*path.parts[index:])
-            break
+            self.listings.pop(Path(directory), None)
 
-    return result
+def path_join_insensitive(base, path, resolver=None):
+    return (PathResolver() if resolver is None else resolver).join(base, path)
 
 def path_equal_insensitive(path1, path2):
-    return str(path1).lower() == str(path2).lower()
\ No newline at end of file
+    return str(path1).lower() == str(path2).lower()
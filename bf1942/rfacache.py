@@ -0,0 +1,68 @@
+import hashlib
+import os
+import struct
+from array import array
+from pathlib import Path
+
+TOC_CACHE_MAGIC = b'RFATOC\x00\x01'
+TOC_CACHE_HEADER = struct.Struct('=8sQqIIqII') # magic, size, mtime, compressed, has xpack id, xpack id, entries, path table size
+
+class RfaTocCache:
+    '''Stores parsed RFA tables of contents in a directory, keyed by archive path, size and modification time.
+
+    Each cache file holds a fixed header, the csize/ucsize/doffset of every entry as one array of 32 bit integers and
+    the entry paths as one NUL separated UTF-8 string, so loading it takes a single read. Integers are stored in native
+    byte order, cache directories are not meant to be shared between machines.
+    '''
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def cache_path(self, rfa_path):
+        key = hashlib.sha1(os.path.abspath(rfa_path).encode('utf-8'), usedforsecurity=False).hexdigest()
+        return self.directory / f'{key}.toc'
+
+    def load(self, rfa_path):
+        '''Return (compressed, xpack header id, paths, infos) for an unchanged archive, None otherwise.
+
+        infos is an array of csize, ucsize and doffset values, three per entry.
+        '''
+
+        try:
+            stat = os.stat(rfa_path)
+            contents = self.cache_path(rfa_path).read_bytes()
+            magic, size, mtime, compressed, has_xpack, xpack, entries, paths_size = TOC_CACHE_HEADER.unpack_from(contents)
+        except (OSError, struct.error):
+            return None
+
+        if magic != TOC_CACHE_MAGIC or size != stat.st_size or mtime != stat.st_mtime_ns:
+            return None
+
+        infos_start = TOC_CACHE_HEADER.size
+        paths_start = infos_start + entries * 12
+        if len(contents) != paths_start + paths_size:
+            return None
+
+        infos = array('I')
+        infos.frombytes(contents[infos_start:paths_start])
+        paths = contents[paths_start:].decode('utf-8').split('\0') if entries > 0 else []
+
+        return compressed == 1, xpack if has_xpack else None, paths, infos
+
+    def store(self, rfa_path, compressed, xpack, paths, infos):
+        stat = os.stat(rfa_path)
+        paths_bytes = '\0'.join(paths).encode('utf-8')
+        infos = array('I', infos)
+        header = TOC_CACHE_HEADER.pack(TOC_CACHE_MAGIC, stat.st_size, stat.st_mtime_ns, 1 if compressed else 0,
+            0 if xpack is None else 1, 0 if xpack is None else xpack, len(paths), len(paths_bytes))
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.cache_path(rfa_path)
+        tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+
+        with open(tmp_path, 'wb') as file:
+            file.write(header)
+            file.write(infos.tobytes())
+            file.write(paths_bytes)
+
+        os.replace(tmp_path, path)
@@ -0,0 +1,80 @@
+import fnmatch
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from bf1942.RFA import RefractorFlatArchive, normalizePath, orderedMap
+from bf1942.rfautil import find_rfas
+
+TEXT_ENCODING = 'latin-1'
+
+class SearchMatch:
+    def __init__(self, rfa, path, line_number, line):
+        self.rfa = rfa
+        self.path = path
+        self.line_number = line_number
+        self.line = line
+
+def compile_pattern(pattern, literal=False, ignore_case=False):
+    '''Compile a regex or literal pattern for matching against decompressed entry bytes.'''
+
+    if isinstance(pattern, str):
+        pattern = pattern.encode(TEXT_ENCODING)
+    if literal:
+        pattern = re.escape(pattern)
+
+    return re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+
+def path_matches(path, include=None, exclude=None):
+    '''Case insensitive glob filter on entry paths, include defaults to every path.'''
+
+    path = normalizePath(path)
+
+    if include and not any(fnmatch.fnmatchcase(path, normalizePath(glob)) for glob in include):
+        return False
+
+    return not exclude or not any(fnmatch.fnmatchcase(path, normalizePath(glob)) for glob in exclude)
+
+def search_data(data, pattern):
+    '''Yield (line number, line) for every line of data with at least one match.'''
+
+    line_number = 1
+    position = 0
+    end = -1
+
+    for match in pattern.finditer(data):
+        if match.start() <= end:
+            continue # line already reported
+
+        line_number += data.count(b'\n', position, match.start())
+        start = data.rfind(b'\n', 0, match.start()) + 1
+        end = data.find(b'\n', match.start())
+        end = len(data) if end == -1 else end
+        position = start
+
+        yield line_number, data[start:end].rstrip(b'\r').decode(TEXT_ENCODING)
+
+def search_rfa(rfa_path, pattern, include=None, exclude=None, workers=None):
+    '''Yield a SearchMatch for every matching line of the entries of an RFA, in archive order.
+
+    Entries are filtered by path before they are decompressed and decompressed by a pool of workers threads, nothing is
+    written to disk.
+    '''
+
+    rfa = RefractorFlatArchive(rfa_path)
+    files = sorted((file for file in rfa.iterEntries() if path_matches(file.path, include, exclude)), key=lambda file: file.file_info.doffset)
+
+    def search_file(file):
+        data = rfa.extractBlock(file.file_info, asBytes=True)
+        return [] if data is False else list(search_data(data, pattern))
+
+    with rfa.mapped():
+        with ThreadPoolExecutor(workers) if workers is not None and workers > 1 else nullcontext() as pool:
+            for file, lines in orderedMap(pool, search_file, files, 4 * (workers or 1)):
+                for line_number, line in lines:
+                    yield SearchMatch(rfa_path, file.path, line_number, line)
+
+def search(paths, pattern, include=None, exclude=None, workers=None):
+    '''Search every RFA given or found below the given directories.'''
+
+    for rfa_path in find_rfas(paths):
+        yield from search_rfa(rfa_path, pattern, include, exclude, workers)
@@ -1,10 +1,14 @@
 import logging
 import os
+import posixpath
 import shutil
 import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from bf1942.RFA import RefractorFlatArchive
-from bf1942.path import path_join_insensitive, path_equal_insensitive
+from bf1942.RFA import COMPRESSION_BEST, COMPRESSION_FAST, COMPRESSION_STORE, CompressionPolicy, RefractorFlatArchive, RefractorFlatArchiveEntry
+from bf1942.manifest import compare_manifests, read_hashes, read_manifest, scan_sources, write_hashes, write_manifest
+from bf1942.path import PathResolver
 
 logger = logging.getLogger(__name__)
 
@@ -44,21 +48,55 @@ def get_common_root(dirs):
 
     return root
 
-def compare_dirs(root, compare, dirs):
-    root_path = Path(root)
-    dirs_lower = set([x.lower() for x in dirs])
-    return [path_join_insensitive(root_path, x) for x in (compare & dirs_lower)]
+class ExtractionPlan:
+    def __init__(self, directories, targets):
+        self.directories = directories
+        self.targets = targets
 
-def extract_rfa(src, dst, ovr):
+    def create_directories(self):
+        for directory in self.directories:
+            directory.mkdir(parents=True, exist_ok=True)
+
+def plan_extraction(files, dst, lowercase=False, resolver=None):
+    '''Plan the destination of every RFA entry below dst, directories whose names differ only in case are merged.
+
+    A directory keeps the name it already has below dst, otherwise the name it is first seen with in the entries, or its
+    lowercase name with lowercase. Directories are listed parents first, so they can all be created before extracting.
+    '''
+
+    resolver = PathResolver() if resolver is None else resolver
+    spellings = {'': ''}
+
+    def canonical(directory):
+        key = directory.lower()
+        if key not in spellings:
+            parent, name = posixpath.split(directory)
+            spellings[key] = posixpath.join(canonical(parent), name.lower() if lowercase else name)
+        return spellings[key]
+
+    entries = []
+    for file in files:
+        directory, name = posixpath.split(file.path.replace('\\', '/'))
+        entries.append((file, canonical(directory), name))
+
+    directories = sorted(set(directory for file, directory, name in entries))
+    resolved = dict(zip(directories, resolver.join_many(dst, directories)))
+
+    targets = {directory: str(resolved[directory]) for directory in directories}
+
+    return ExtractionPlan([resolved[directory] for directory in directories if directory], [(file, os.path.join(targets[directory], name)) for file, directory, name in entries])
+
+def extract_rfa(src, dst, ovr, workers=None, lowercase=False):
     item = Path(src).name
 
     rfa = RefractorFlatArchive(src)
 
-    root = get_common_root([Path(f.path).parent for f in rfa.fileList])
+    root = get_common_root([Path(directory) for directory in set(posixpath.dirname(path) for path in rfa.getFileList())])
     if root is None:
         return
 
-    dst_path = Path(dst) / root
+    resolver = PathResolver()
+    dst_path = resolver.join(dst, root)
 
     if dst_path.exists() and ovr is False:
         logger.info(f'extract: skip {item}')
@@ -66,101 +104,347 @@ def extract_rfa(src, dst, ovr):
 
     if dst_path.exists():
         shutil.rmtree(dst_path)
+        resolver.invalidate()
         logger.info(f'extract: overwrite {root}')
     else:
         logger.info(f'extract: process {root}')
 
-    # TODO could be problematic if there are casing differences between destination paths and stored paths
-    rfa.extractAll(dst)
+    plan = plan_extraction(rfa.iterEntries(), dst, lowercase, resolver)
+    plan.create_directories()
+    rfa.extractEntries(plan.targets, workers, createDirectories=False)
 
-def extract_directory(src, dst, ovr):
+def extract_directory(src, dst, ovr, workers=None, jobs=None, lowercase=False):
     src_path = Path(src)
     rfas = [f for f in src_path.iterdir() if f.is_file() and f.suffix == '.rfa']
 
-    for item in rfas:
-        extract_rfa(item, dst, ovr)
+    tasks = [ArchiveTask(item.name, item.stat().st_size, extract_rfa, (item, dst, ovr, workers, lowercase)) for item in rfas]
+    return run_archive_tasks(tasks, jobs)
 
-def extract_mod(src, dst, ovr):
+def extract_mod(src, dst, ovr, workers=None, jobs=None, lowercase=False):
+    dst_path = Path(dst)
+    tasks = [ArchiveTask(archive.name, archive.size, extract_rfa, (archive.path, dst_path, ovr, workers, lowercase)) for archive in scan_mod(src)]
+
+    return run_archive_tasks(tasks, jobs)
+
+def pack_mod(src, dst, ovr, workers=None, incremental=False, jobs=None, deduplicate=False, compression=None, patch=False):
     src_path = Path(src)
     dst_path = Path(dst)
-    bf1942_path = src_path / BF1942_DIRECTORY
-    levels_path = bf1942_path / LEVELS_DIRECTORY
+    tasks = []
+    resolver = PathResolver()
+
+    resolver.mkdir(dst_path, parents=True, exist_ok=True)
+
+    # sizes are only needed to schedule the largest archives first
+    for archive in scan_mod(src_path, extracted=True, sizes=jobs is not None and jobs > 1):
+        archive_dst_path = resolver.join(dst_path, archive.directory)
+        resolver.mkdir(archive_dst_path, parents=True, exist_ok=True)
+        tasks.append(ArchiveTask(archive.name, archive.size, pack_directory, (archive.path, archive_dst_path, ovr, src_path, workers, incremental, deduplicate, compression, patch)))
+
+    return run_archive_tasks(tasks, jobs)
+
+class ModArchive:
+    def __init__(self, name, path, directory, size):
+        self.name = name
+        self.path = path
+        self.directory = directory
+        self.size = size
+
+def scan_directory(path):
+    '''Return the entries of a directory sorted by name, empty if it cannot be read.'''
+
+    try:
+        with os.scandir(path) as entries:
+            return sorted(entries, key=lambda entry: entry.name)
+    except OSError:
+        return []
+
+def find_directory(entries, name):
+    return next((entry for entry in entries if entry.name.lower() == name and entry.is_dir()), None)
+
+def scan_mod(src, extracted=False, sizes=False):
+    '''List the RFAs of a mod, or the directories packed into them if extracted is true, as ModArchive objects.
+
+    Only the mod root, bf1942/ and bf1942/levels/ are scanned, matching directory names case insensitively. Each
+    ModArchive holds the RFA file name, the RFA or directory path, the directory of the RFA relative to the mod root and
+    its size. Sizes of extracted directories are only computed if sizes is true, they are 0 otherwise.
+    '''
+
+    archives = []
+
+    def add_archives(entries, names, directory):
+        for entry in entries:
+            if extracted:
+                if not entry.is_dir() or (names is not None and entry.name.lower() not in names):
+                    continue
+                name = f'{entry.name}.rfa'
+                size = directory_size(entry.path) if sizes else 0
+            else:
+                if not entry.is_file() or not entry.name.endswith('.rfa') or (names is not None and entry.name[:-4].lower() not in names):
+                    continue
+                name = entry.name
+                size = entry.stat().st_size
+            archives.append(ModArchive(name, Path(entry.path), directory, size))
+
+    entries = scan_directory(src)
+    add_archives(entries, TOP_LEVEL_RFAS, Path())
+
+    bf1942 = find_directory(entries, BF1942_DIRECTORY)
+    if bf1942 is not None:
+        entries = scan_directory(bf1942.path)
+        add_archives(entries, BF1942_LEVEL_RFAS, Path(bf1942.name))
+
+        levels = find_directory(entries, LEVELS_DIRECTORY)
+        if levels is not None:
+            add_archives(scan_directory(levels.path), None, Path(bf1942.name, levels.name))
+
+    return archives
+
+def directory_size(path):
+    size = 0
+
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                size += directory_size(entry.path)
+            elif entry.is_file():
+                size += entry.stat().st_size
+
+    return size
+
+class ArchiveTask:
+    def __init__(self, name, size, function, args):
+        self.name = name
+        self.size = size
+        self.function = function
+        self.args = args
+
+class LogRecordCollector(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        # format now so the record pickles without its arguments or traceback
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        self.records.append(record)
+
+def run_archive_task(function, args):
+    '''Run an archive task in a worker process, returning its log records and error instead of emitting or raising them.'''
+
+    root_logger = logging.getLogger()
+    collector = LogRecordCollector()
+    handlers = root_logger.handlers
+    level = root_logger.level
+
+    # forked workers inherit the handlers of the parent, records are emitted by the parent instead
+    root_logger.handlers = [collector]
+    root_logger.setLevel(min(level, logging.INFO))
+
+    try:
+        function(*args)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    finally:
+        root_logger.handlers = handlers
+        root_logger.setLevel(level)
+
+    return collector.records, error
+
+def run_archive_tasks(tasks, jobs=None, mp_context=None):
+    '''Run archive tasks largest first, across jobs processes when jobs is greater than one.
+
+    Log messages of each task are emitted by the calling process once the task finishes. A failing task does not stop
+    the others, the names of the failed tasks are returned. mp_context is the multiprocessing context of the processes,
+    the platform default if None.
+    '''
+
+    tasks = sorted(tasks, key=lambda task: task.size, reverse=True)
+    failed = []
+
+    def report(task, error):
+        if error is not None:
+            logger.error(f'{task.name} failed:\n{error}')
+            failed.append(task.name)
+
+    if jobs is None or jobs <= 1:
+        for task in tasks:
+            try:
+                task.function(*task.args)
+                error = None
+            except Exception:
+                error = traceback.format_exc()
+            report(task, error)
+    else:
+        with ProcessPoolExecutor(jobs, mp_context=mp_context) as pool:
+            futures = {pool.submit(run_archive_task, task.function, task.args): task for task in tasks}
+            for future in as_completed(futures):
+                try:
+                    records, error = future.result()
+                except Exception:
+                    # the worker process died, the pool is broken and the remaining tasks fail the same way
+                    records, error = [], traceback.format_exc()
+                for record in records:
+                    # workers collect every record, only those the calling process would log are emitted
+                    record_logger = logging.getLogger(record.name)
+                    if record_logger.isEnabledFor(record.levelno):
+                        record_logger.handle(record)
+                report(futures[future], error)
+
+    if len(failed) > 0:
+        logger.error(f'{len(failed)} of {len(tasks)} archives failed: {", ".join(failed)}')
+
+    return failed
+
+def rfa_destination(src, dst):
+    '''Return the path of the RFA packed from src, dst is either the RFA itself or the directory it is written to.'''
 
-    for root, dirs, files in os.walk(src_path):
-        root_path = Path(root)
+    dst_path = Path(dst)
+    return dst_path if dst_path.suffix == '.rfa' else dst_path / f'{Path(src).name}.rfa'
 
-        if root_path == src_path:
-            paths = [Path(f) for f in files]
-            rfas = [p for p in paths if p.suffix == '.rfa' and p.stem.lower() in TOP_LEVEL_RFAS]
+def pack_directory(src, dst, ovr, base, workers=None, incremental=False, deduplicate=False, compression=None, patch=False):
+    src_path = Path(src)
+    dst_item = rfa_destination(src, dst)
+    rfa_name = dst_item.name
 
-            for rfa in rfas:
-                extract_rfa(root_path / rfa, dst_path, ovr)
+    if incremental:
+        # RFAs packed with other options are packed in full, as is every RFA when overwriting
+        options = pack_options(deduplicate, compression)
+        previous = read_manifest(dst_item, options) if dst_item.exists() and not ovr else None
+        files, paths = scan_sources(src_path, base, previous)
 
-        elif path_equal_insensitive(root_path, bf1942_path):
-            paths = [Path(f) for f in files]
-            rfas = [p for p in paths if p.suffix == '.rfa' and p.stem.lower() in BF1942_LEVEL_RFAS]
+        if previous is not None:
+            update_rfa(dst_item, previous, files, paths, workers, deduplicate, compression, patch=patch)
+            write_manifest(dst_item, files, options)
+            return
 
-            for rfa in rfas:
-                extract_rfa(root_path / rfa, dst_path, ovr)
+    if dst_item.exists() and ovr is False and incremental is False:
+        logger.info(f'pack: skip {rfa_name}')
+        return
+
+    if dst_item.exists():
+        logger.info(f'pack: overwrite {rfa_name}')
+    else:
+        logger.info(f'pack: process {rfa_name}')
 
-        elif path_equal_insensitive(root_path, levels_path):
-            paths = [Path(f) for f in files]
-            rfas = [p for p in paths if p.suffix == '.rfa']
+    rfa = RefractorFlatArchive(src_path)
+    rfa.addDirectory(src_path, str(base))
+    rfa.write(dst_item, workers=workers, deduplicate=deduplicate, compression=compression)
+
+    if incremental:
+        write_manifest(dst_item, files, options)
+
+def pack_options(deduplicate=False, compression=None):
+    '''Describe the pack options that affect the contents of an RFA, as recorded in its manifest.'''
+
+    if compression is None:
+        compression = CompressionPolicy()
+    elif isinstance(compression, int):
+        compression = CompressionPolicy(compression)
+
+    return {
+        'deduplicate': deduplicate,
+        'level': compression.level,
+        'extensions': compression.extensions,
+        'store_incompressible': compression.storeIncompressible
+    }
+
+def update_rfa(rfa_path, previous, files, paths, workers=None, deduplicate=False, compression=None, rfa=None, patch=False, recompress=False):
+    '''Rewrite an RFA with the entries that changed between two manifests, return whether anything changed.
+
+    rfa can be an already read RefractorFlatArchive of rfa_path, it is updated in place. Unchanged entries are copied as
+    they are stored unless recompress is true, then compression applies to them too. With patch, changed entries are
+    appended to the RFA instead of rewriting it, deduplicate and recompress are ignored then. Raises if a source cannot
+    be read, leaving the RFA as it was.
+    '''
+
+    rfa_name = Path(rfa_path).name
+    changed, removed = compare_manifests(previous, files)
+
+    if len(changed) == 0 and len(removed) == 0:
+        logger.info(f'pack: unchanged {rfa_name}')
+        return False
+
+    logger.info(f'pack: update {rfa_name} ({len(changed)} changed, {len(removed)} removed)')
+
+    rfa = RefractorFlatArchive(str(rfa_path)) if rfa is None else rfa
+    for entry in removed:
+        rfa.removeFile(entry)
+    for entry in changed:
+        rfa.addEntry(RefractorFlatArchiveEntry(entry, is_external=True, external_filepath=paths[entry]))
+    try:
+        if patch:
+            rfa.patch(workers=workers, compression=compression)
+        else:
+            rfa.write(workers=workers, deduplicate=deduplicate, compression=compression, recompress=recompress)
+    except Exception:
+        # the RFA on disk is unchanged, so are the entries of rfa, the update is retried in full next time
+        rfa.read()
+        raise
+    return True
+
+def find_rfas(paths):
+    '''Expand directories to the RFAs below them, RFA paths are kept as given.'''
+
+    rfas = []
+
+    for path in paths:
+        path = Path(path)
+
+        if not path.is_dir():
+            rfas.append(path)
+            continue
 
-            for rfa in rfas:
-                extract_rfa(root_path / rfa, dst_path, ovr)
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            rfas += [Path(root) / file for file in sorted(files) if file.lower().endswith('.rfa')]
 
-def pack_mod(src, dst, ovr):
-    src_path = Path(src)
-    dst_path = Path(dst)
-    bf1942_path = src_path / BF1942_DIRECTORY
-    levels_path = bf1942_path / LEVELS_DIRECTORY
+    return rfas
 
-    dst_path.mkdir(parents=True, exist_ok=True)
+def verify_rfa(path, workers=None, use_hashes=False, record_hashes=False, progress=None):
+    '''Return the problems found in an RFA as (entry path, problem) tuples, the entry path is None for the whole RFA.
 
-    for root, dirs, files in os.walk(src_path):
-        root_path = Path(root)
+    With use_hashes, entries are compared to the hashes recorded next to the RFA instead of being decompressed, RFAs
+    without recorded hashes are verified in full. With record_hashes, the hashes of a fully verified intact RFA are
+    recorded for later runs.
+    '''
 
-        if root_path == src_path:
-            items = compare_dirs(root_path, TOP_LEVEL_RFAS, dirs)
-            for item in items:
-                pack_directory(item, dst_path, ovr, src_path)
+    rfa = RefractorFlatArchive(path)
+    recorded = read_hashes(path) if use_hashes else None
+    hashes = None
 
-        elif path_equal_insensitive(root_path, bf1942_path):
-            bf1942_dst_path = path_join_insensitive(dst_path, root_path.name)
-            bf1942_dst_path.mkdir(parents=True, exist_ok=True)
+    if recorded is not None:
+        size, hashes = recorded
+        if size != rfa.fileSize:
+            return [(None, f'archive is {rfa.fileSize} bytes, it was {size} bytes when its hashes were recorded')]
 
-            items = compare_dirs(root_path, BF1942_LEVEL_RFAS, dirs)
-            for item in items:
-                pack_directory(item, bf1942_dst_path, ovr, src_path)
+    problems = rfa.verify(workers, progress, hashes)
 
-        elif path_equal_insensitive(root_path, levels_path):
-            levels_dst_path = path_join_insensitive(dst_path, Path(root_path.parent.name, root_path.name))
-            levels_dst_path.mkdir(parents=True, exist_ok=True)
+    if record_hashes and hashes is None and not problems:
+        write_hashes(path, rfa.fileSize, rfa.storedHashes(workers))
 
-            for item in dirs:
-                pack_directory(root_path / item, levels_dst_path, ovr, src_path)
+    return problems
 
-def pack_directory(src, dst, ovr, base):
-    src_path = Path(src)
-    dst_path = Path(dst)
+def compression_report(src, base):
+    rfa = RefractorFlatArchive(src, read=False)
+    rfa.addDirectory(str(src), str(base))
+    return rfa.compressionReport()
 
-    if dst_path.suffix == '.rfa':
-        rfa_name = dst_path.name
-        dst_item = dst_path
-    else:
-        rfa_name = f'{src_path.name}.rfa'
-        dst_item = dst_path / rfa_name
+def format_compression_report(report):
+    levels = [COMPRESSION_STORE, COMPRESSION_FAST, COMPRESSION_BEST]
+    names = {COMPRESSION_STORE: 'store', COMPRESSION_FAST: 'fast', COMPRESSION_BEST: 'best'}
 
-    if dst_item.exists() and ovr is False:
-        logger.info(f'pack: skip {rfa_name}')
-        return
+    header = f'{"extension":<12}{"files":>8}{"size":>14}' + ''.join(f'{names[level] + " size":>16}{names[level] + " time":>12}' for level in levels)
+    lines = [header]
 
-    if dst_item.exists():
-        logger.info(f'pack: overwrite {rfa_name}')
-    else:
-        logger.info(f'pack: process {rfa_name}')
+    for extension, stats in sorted(report.items(), key=lambda item: item[1]['size'], reverse=True):
+        line = f'{extension or "(none)":<12}{stats["files"]:>8}{stats["size"]:>14}'
+        for level in levels:
+            size, seconds = stats[level]
+            ratio = size / stats['size'] if stats['size'] > 0 else 1
+            line += f'{size:>9} ({ratio:4.0%}){seconds:>11.2f}s'
+        lines.append(line)
 
-    rfa = RefractorFlatArchive(src_path)
-    rfa.addDirectory(src_path, str(base))
-    rfa.write(dst_item)
+    return lines
@@ -0,0 +1,77 @@
+import shutil
+import unittest
+from unittest import mock
+from bf1942 import RFA
+from bf1942.RFA import COMPRESSION_FAST, COMPRESSION_STORE, CompressionPolicy, RefractorFlatArchive, RefractorFlatArchiveGroup
+from bf1942.testutil import *
+
+class TestMethod(unittest.TestCase):
+    def setUp(self):
+        self.base = create_dummy_directory(__file__)
+
+        old = RefractorFlatArchive(self.base)
+        old.addFileAsString('objects/jeep.con', 'jeep')
+        old.addFileAsString('objects/tank.con', 'tank')
+        old.addFileAsString('objects/removed.con', 'removed')
+        old.addFileAsString('objects/resized.con', 'resized')
+        old.addFileAsString('texture/large.dds', 'abcd' * 50000)
+        old.write(self.base / 'old.rfa')
+
+        new = RefractorFlatArchive(self.base)
+        new.addFileAsString('Objects/Jeep.con', 'jeep')
+        new.addFileAsString('objects/tank.con', 'TANK')
+        new.addFileAsString('objects/added.con', 'added')
+        new.addFileAsString('objects/resized.con', 'resized!')
+        new.addFileAsString('texture/large.dds', 'abcd' * 50000)
+        new.write(self.base / 'new.rfa')
+
+    def tearDown(self):
+        shutil.rmtree(self.base)
+
+    def test_diff_archives(self):
+        old = RefractorFlatArchive(self.base / 'old.rfa')
+        new = RefractorFlatArchive(self.base / 'new.rfa')
+
+        for workers in (None, 4):
+            self.assertEqual((['objects/added.con'], ['objects/removed.con'], ['objects/resized.con', 'objects/tank.con']), old.diff(new, workers))
+
+    def test_identical_stored_entries_are_not_decompressed(self):
+        old = RefractorFlatArchive(self.base / 'old.rfa')
+        new = RefractorFlatArchive(self.base / 'new.rfa')
+
+        with mock.patch.object(RFA.lzo, 'decompress', wraps=RFA.lzo.decompress) as decompress:
+            old.diff(new)
+        self.assertEqual(2, decompress.call_count) # objects/tank.con in both archives
+
+    def test_differently_compressed_entries_are_compared_by_contents(self):
+        repacked = RefractorFlatArchive(self.base)
+        repacked.addFileAsString('Objects/Jeep.con', 'jeep')
+        repacked.addFileAsString('objects/tank.con', 'TANK')
+        repacked.addFileAsString('objects/added.con', 'added')
+        repacked.addFileAsString('objects/resized.con', 'resized!')
+        repacked.addFileAsString('texture/large.dds', 'abcd' * 50000)
+        repacked.write(self.base / 'repacked.rfa', compression=CompressionPolicy(COMPRESSION_FAST, {'.dds': COMPRESSION_STORE}))
+        RefractorFlatArchive(self.base / 'new.rfa').write(self.base / 'uncompressed.rfa', compressed=False)
+        new = RefractorFlatArchive(self.base / 'new.rfa')
+        repacked = RefractorFlatArchive(self.base / 'repacked.rfa')
+
+        # both archives are compressed but store texture/large.dds differently, its contents have to be compared
+        self.assertNotEqual(new.getEntry('texture/large.dds').file_info.csize, repacked.getEntry('texture/large.dds').file_info.csize)
+        with mock.patch.object(RFA.lzo, 'decompress', wraps=RFA.lzo.decompress) as decompress:
+            self.assertEqual(([], [], []), new.diff(repacked))
+        self.assertEqual(2 * 7, sum(1 for call in decompress.call_args_list if call.args[2] > 1000)) # segments of texture/large.dds
+
+        self.assertEqual(([], [], []), new.diff(RefractorFlatArchive(self.base / 'uncompressed.rfa')))
+        self.assertEqual(([], [], []), RefractorFlatArchive(self.base / 'uncompressed.rfa').diff(repacked))
+
+    def test_diff_groups(self):
+        mod = RefractorFlatArchive(self.base)
+        mod.addFileAsString('objects/tank.con', 'TANK')
+        mod.write(self.base / 'mod.rfa')
+        old = RefractorFlatArchiveGroup([self.base / 'mod.rfa', self.base / 'old.rfa'])
+        new = RefractorFlatArchiveGroup([self.base / 'new.rfa'])
+
+        self.assertEqual((['objects/added.con'], ['objects/removed.con'], ['objects/resized.con']), old.diff(new, workers=2))
+
+if __name__ == '__main__':
+    unittest.main()
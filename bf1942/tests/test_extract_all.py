@@ -0,0 +1,59 @@
+import os
+import shutil
+import unittest
+from bf1942.RFA import RefractorFlatArchive
+from bf1942.testutil import *
+
+class TestMethod(unittest.TestCase):
+    def setUp(self):
+        self.base = create_dummy_directory(__file__)
+        self.dst = self.base / 'dst'
+        self.large = os.urandom(32768 * 10) + b'tail' * 1000
+
+        rfa = RefractorFlatArchive(self.base)
+        rfa.addFileAsString('objects/objects.con', 'objects')
+        rfa.addFileAsString('objects/vehicles/jeep.con', 'jeep')
+        (self.base / 'large.dat').write_bytes(self.large)
+        rfa.addFile(self.base / 'large.dat', self.base)
+        rfa.write(self.base / 'compressed.rfa')
+        rfa.write(self.base / 'uncompressed.rfa', compressed=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.base)
+
+    def assert_extracted(self):
+        self.assertEqual('objects', (self.dst / 'objects' / 'objects.con').read_text())
+        self.assertEqual('jeep', (self.dst / 'objects' / 'vehicles' / 'jeep.con').read_text())
+        self.assertEqual(self.large, (self.dst / 'large.dat').read_bytes())
+
+    def test_extracts_compressed_archive(self):
+        RefractorFlatArchive(self.base / 'compressed.rfa').extractAll(self.dst)
+
+        self.assert_extracted()
+
+    def test_extracts_uncompressed_archive(self):
+        RefractorFlatArchive(self.base / 'uncompressed.rfa').extractAll(self.dst)
+
+        self.assert_extracted()
+
+    def test_parallel_extraction_matches_serial(self):
+        rfa = RefractorFlatArchive(self.base / 'compressed.rfa')
+        rfa.extractAll(self.base / 'serial')
+        rfa.extractAll(self.dst, workers=4)
+
+        self.assert_extracted()
+        for path in rfa.getFileList():
+            self.assertEqual(compute_hash(self.base / 'serial' / path), compute_hash(self.dst / path))
+
+    def test_extracts_files_from_single_mapping(self):
+        rfa = RefractorFlatArchive(self.base / 'compressed.rfa')
+
+        with rfa.mapped() as buffer:
+            self.assertEqual('jeep', rfa.extractFile('objects/vehicles/jeep.con', asString=True))
+            self.assertEqual(self.large, rfa.extractBlock(rfa.getEntry('large.dat').file_info, asBytes=True))
+            self.assertIs(buffer, rfa.buffer)
+
+        self.assertIsNone(rfa.buffer)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import shutil
+import unittest
+from unittest import mock
+from bf1942.RFA import RefractorFlatArchive
+from bf1942.testutil import *
+
+class TestMethod(unittest.TestCase):
+    def setUp(self):
+        self.base = create_dummy_directory(__file__)
+        self.dst = self.base / 'dst'
+        self.large = os.urandom(32768 * 10) + b'tail' * 1000
+
+        rfa = RefractorFlatArchive(self.base)
+        rfa.addFileAsString('objects/objects.con', 'objects')
+        rfa.addFileAsString('objects/vehicles/jeep.con', 'jeep')
+        rfa.addFileAsString('menu/menu.con', 'menu')
+        (self.base / 'large.dat').write_bytes(self.large)
+        rfa.addFile(self.base / 'large.dat', self.base)
+        rfa.write(self.base / 'objects.rfa')
+
+    def tearDown(self):
+        shutil.rmtree(self.base)
+
+    def test_extracts_requested_paths(self):
+        for workers in (None, 4):
+            shutil.rmtree(self.dst, ignore_errors=True)
+            rfa = RefractorFlatArchive(self.base / 'objects.rfa')
+            missing = rfa.extractMany(['large.dat', 'OBJECTS\\Vehicles\\Jeep.con', 'objects/missing.con'], self.dst, workers)
+
+            self.assertEqual(['objects/missing.con'], missing)
+            self.assertEqual(self.large, (self.dst / 'large.dat').read_bytes())
+            self.assertEqual('jeep', (self.dst / 'objects' / 'vehicles' / 'jeep.con').read_text())
+            self.assertFalse((self.dst / 'objects' / 'objects.con').exists())
+            self.assertFalse((self.dst / 'menu').exists())
+
+    def test_extracts_in_archive_order(self):
+        rfa = RefractorFlatArchive(self.base / 'objects.rfa')
+        with mock.patch.object(rfa, 'extractBlock', wraps=rfa.extractBlock) as extractBlock:
+            rfa.extractMany(['menu/menu.con', 'large.dat', 'objects/objects.con'], self.dst)
+
+        offsets = [call.args[0].doffset for call in extractBlock.call_args_list]
+        self.assertEqual(3, len(offsets))
+        self.assertEqual(sorted(offsets), offsets)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -36,7 +36,15 @@ class TestMethod(unittest.TestCase):
 
     def test_extracts_all_known_rfas(self):
         extract_mod(self.src, self.dst, False)
+        self.assert_extracted()
 
+    def test_extracts_rfas_in_parallel_processes(self):
+        failed = extract_mod(self.src, self.dst, False, jobs=2)
+
+        self.assertEqual([], failed)
+        self.assert_extracted()
+
+    def assert_extracted(self):
         for directory in TOP_LEVEL_RFAS:
             self.assertTrue((self.dst / directory / f'{directory}.con').exists())
 
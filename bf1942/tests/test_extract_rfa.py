@@ -1,5 +1,6 @@
 import unittest
 from pathlib import Path
+from bf1942.path import path_join_insensitive
 from bf1942.rfautil import *
 from bf1942.testutil import *
 
@@ -36,4 +37,43 @@ class TestMethod(unittest.TestCase):
         extract_rfa(self.base / 'objects.rfa', self.base, True)
 
         assert_file_hash(self, expected_hash, existing_file, has_changed=True)
-        self.assertTrue(Path(self.base / 'objects' / 'objects2.con').exists())
\ No newline at end of file
+        self.assertTrue(Path(self.base / 'objects' / 'objects2.con').exists())
+
+    def test_merges_directories_differing_in_case(self):
+        rfa = RefractorFlatArchive(self.base)
+        rfa.addFileAsString('Objects/Vehicles/Jeep.con', 'jeep')
+        rfa.addFileAsString('objects/vehicles/tank.con', 'tank')
+        rfa.addFileAsString('OBJECTS/objects.con', 'objects')
+        rfa.write(self.base / 'mixed.rfa')
+
+        extract_rfa(self.base / 'mixed.rfa', self.base / 'dst', False)
+
+        objects = list((self.base / 'dst').iterdir())
+        self.assertEqual(1, len(objects))
+        self.assertEqual(['objects.con', 'vehicles'], sorted(p.name.lower() for p in objects[0].iterdir()))
+        self.assertEqual(['Jeep.con', 'tank.con'], sorted(p.name for p in path_join_insensitive(objects[0], 'vehicles').iterdir()))
+
+    def test_plan_uses_existing_directory_casing(self):
+        (self.base / 'dst' / 'OBJECTS').mkdir(parents=True)
+
+        plan = plan_extraction([RefractorFlatArchiveEntry('objects/vehicles/jeep.con')], self.base / 'dst')
+
+        self.assertEqual([(self.base / 'dst' / 'OBJECTS' / 'vehicles')], plan.directories)
+        self.assertEqual(self.base / 'dst' / 'OBJECTS' / 'vehicles' / 'jeep.con', Path(plan.targets[0][1]))
+
+    def test_lowercase_directories(self):
+        rfa = RefractorFlatArchive(self.base)
+        rfa.addFileAsString('Objects/Vehicles/Jeep.con', 'jeep')
+        rfa.write(self.base / 'mixed.rfa')
+
+        extract_rfa(self.base / 'mixed.rfa', self.base / 'dst', False, lowercase=True)
+
+        self.assertTrue(Path(self.base / 'dst' / 'objects' / 'vehicles' / 'Jeep.con').exists())
+
+    def test_plan_creates_each_directory_once(self):
+        files = [RefractorFlatArchiveEntry(path) for path in ['a/B/c.con', 'A/b/d.con', 'a/e.con', 'f.con']]
+
+        plan = plan_extraction(files, self.base / 'dst')
+
+        self.assertEqual([self.base / 'dst' / 'a', self.base / 'dst' / 'a' / 'B'], plan.directories)
+        self.assertEqual([self.base / 'dst' / 'a' / 'B' / 'c.con', self.base / 'dst' / 'a' / 'B' / 'd.con', self.base / 'dst' / 'a' / 'e.con', self.base / 'dst' / 'f.con'], [Path(target) for file, target in plan.targets])
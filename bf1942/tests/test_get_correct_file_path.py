@@ -0,0 +1,41 @@
+import shutil
+import unittest
+from bf1942.RFA import RefractorFlatArchive
+from bf1942.testutil import *
+
+class TestMethod(unittest.TestCase):
+    def setUp(self):
+        self.base = create_dummy_directory(__file__)
+
+        rfa = RefractorFlatArchive(self.base)
+        rfa.addFileAsString('Objects/Vehicles/Jeep.con', 'jeep')
+        rfa.addFileAsString('objects/objects.con', 'objects')
+        rfa.write(self.base / 'objects.rfa')
+
+        self.rfa = RefractorFlatArchive(self.base / 'objects.rfa')
+
+    def tearDown(self):
+        shutil.rmtree(self.base)
+
+    def test_lookup_is_case_insensitive(self):
+        self.assertEqual('Objects/Vehicles/Jeep.con', self.rfa.getCorrectFilePath('objects/vehicles/jeep.con'))
+        self.assertEqual('Objects/Vehicles/Jeep.con', self.rfa.getCorrectFilePath('OBJECTS\\VEHICLES\\JEEP.CON'))
+
+    def test_missing_path_returns_none(self):
+        self.assertIsNone(self.rfa.getCorrectFilePath('objects/missing.con'))
+
+    def test_add_replaces_existing_entry(self):
+        self.rfa.addFileAsString('objects/vehicles/jeep.con', 'replaced')
+
+        self.assertEqual(2, len(self.rfa.fileList))
+        self.assertEqual('objects/vehicles/jeep.con', self.rfa.getCorrectFilePath('Objects/Vehicles/Jeep.con'))
+
+    def test_remove_file(self):
+        self.assertTrue(self.rfa.removeFile('OBJECTS/objects.con'))
+        self.assertFalse(self.rfa.removeFile('objects/objects.con'))
+
+        self.assertIsNone(self.rfa.getCorrectFilePath('objects/objects.con'))
+        self.assertEqual(['Objects/Vehicles/Jeep.con'], self.rfa.getFileList())
+
+if __name__ == '__main__':
+    unittest.main()
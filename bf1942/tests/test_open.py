@@ -0,0 +1,67 @@
+import io
+import os
+import shutil
+import unittest
+from bf1942.RFA import MAX_SEGMENT_SIZE, RefractorFlatArchive
+from bf1942.testutil import *
+
+class TestMethod(unittest.TestCase):
+    def setUp(self):
+        self.base = create_dummy_directory(__file__)
+        self.src = self.base / 'src'
+        self.contents = b''.join(b'line %d\r\n' % i + os.urandom(i % 50) for i in range(20000))
+
+        (self.src / 'standardmesh').mkdir(parents=True, exist_ok=True)
+        (self.src / 'standardmesh' / 'large.sm').write_bytes(self.contents)
+        (self.src / 'standardmesh' / 'empty.sm').write_bytes(b'')
+
+        for compressed in (True, False):
+            rfa = RefractorFlatArchive(self.src, read=False)
+            rfa.addDirectory(self.src)
+            rfa.write(self.base / f'{compressed}.rfa', compressed=compressed)
+
+    def tearDown(self):
+        shutil.rmtree(self.base)
+
+    def test_reads_whole_entry(self):
+        for compressed in (True, False):
+            rfa = RefractorFlatArchive(self.base / f'{compressed}.rfa')
+            with rfa.open('StandardMesh/Large.sm') as f:
+                self.assertEqual(self.contents, f.read())
+            with rfa.open('standardmesh/empty.sm') as f:
+                self.assertEqual(b'', f.read())
+
+    def test_seek_and_partial_reads(self):
+        for compressed in (True, False):
+            rfa = RefractorFlatArchive(self.base / f'{compressed}.rfa')
+            with rfa.open('standardmesh/large.sm') as f:
+                self.assertEqual(b'line 0\r\n', f.readline())
+                f.seek(3 * MAX_SEGMENT_SIZE - 10)
+                self.assertEqual(self.contents[3 * MAX_SEGMENT_SIZE - 10:3 * MAX_SEGMENT_SIZE + 10], f.read(20))
+                f.seek(-5, io.SEEK_END)
+                self.assertEqual(self.contents[-5:], f.read())
+                self.assertEqual(b'', f.read(10))
+                self.assertEqual(len(self.contents), f.tell())
+
+    def test_decompresses_only_what_is_read(self):
+        rfa = RefractorFlatArchive(self.base / 'True.rfa')
+        with rfa.open('standardmesh/large.sm') as f:
+            f.read(100)
+            self.assertEqual([0], list(f.raw.cache))
+            f.seek(0)
+            f.read()
+            self.assertEqual(4, len(f.raw.cache))
+
+    def test_reads_added_entries(self):
+        rfa = RefractorFlatArchive(self.base / 'True.rfa')
+        rfa.addFileAsString('objects/added.con', 'added')
+        with rfa.open('objects/added.con') as f:
+            self.assertEqual(b'added', f.read())
+
+    def test_missing_entry(self):
+        rfa = RefractorFlatArchive(self.base / 'True.rfa')
+        with self.assertRaises(FileNotFoundError):
+            rfa.open('standardmesh/missing.sm')
+
+if __name__ == '__main__':
+    unittest.main()
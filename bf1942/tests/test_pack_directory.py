@@ -1,7 +1,10 @@
 import shutil
 import unittest
 from pathlib import Path
-from bf1942.rfautil import pack_directory
+from unittest import mock
+from bf1942.manifest import manifest_path, read_manifest, scan_sources
+from bf1942.RFA import COMPRESSION_STORE, CompressionPolicy, RefractorFlatArchive
+from bf1942.rfautil import pack_directory, pack_options
 from bf1942.testutil import *
 
 class TestMethod(unittest.TestCase):
@@ -46,5 +49,99 @@ class TestMethod(unittest.TestCase):
 
         assert_file_hash(self, expected_hash, self.src_rfa, has_changed=True)
 
+    def test_incremental_writes_manifest(self):
+        pack_directory(str(self.src), str(self.base), False, self.base, incremental=True)
+
+        self.assertTrue(manifest_path(self.src_rfa).exists())
+
+    def test_incremental_skips_unchanged_rfa(self):
+        pack_directory(str(self.src), str(self.base), False, self.base, incremental=True)
+        expected_hash = compute_hash(self.src_rfa)
+
+        pack_directory(str(self.src), str(self.base), False, self.base, incremental=True)
+
+        assert_file_hash(self, expected_hash, self.src_rfa)
+
+    def test_incremental_updates_changed_rfa(self):
+        pack_directory(str(self.src), str(self.base), False, self.base, incremental=True)
+
+        create_dummy_file(self.src / 'foo.con', 'changed')
+        create_dummy_file(self.src / 'baz.con')
+        (self.src / 'bar.con').unlink()
+        pack_directory(str(self.src), str(self.base), False, self.base, incremental=True)
+
+        assert_rfa(self, self.src_rfa, [
+            'src/foo.con',
+            'src/baz.con'
+        ])
+        self.assertEqual('changed\n', RefractorFlatArchive(self.src_rfa).extractFile('src/foo.con', asString=True))
+
+    def test_incremental_patches_changed_rfa(self):
+        pack_directory(str(self.src), str(self.base), False, self.base, incremental=True)
+        original = self.src_rfa.read_bytes()
+
+        create_dummy_file(self.src / 'foo.con', 'changed')
+        pack_directory(str(self.src), str(self.base), False, self.base, incremental=True, patch=True)
+
+        self.assertEqual(original[4:], self.src_rfa.read_bytes()[4:len(original)])
+        self.assertEqual('changed\n', RefractorFlatArchive(self.src_rfa).extractFile('src/foo.con', asString=True))
+        self.assertEqual('foo\n', RefractorFlatArchive(self.src_rfa).extractFile('src/bar.con', asString=True))
+
+    def test_incremental_keeps_rfa_if_source_disappears(self):
+        create_dummy_file(self.src / 'baz.con')
+        pack_directory(str(self.src), str(self.base), False, self.base, incremental=True)
+        expected_hash = compute_hash(self.src_rfa)
+
+        def scan_then_delete(*args):
+            scanned = scan_sources(*args)
+            (self.src / 'baz.con').unlink()
+            return scanned
+
+        create_dummy_file(self.src / 'bar.con', 'changed')
+        create_dummy_file(self.src / 'baz.con', 'changed')
+        with mock.patch('bf1942.rfautil.scan_sources', scan_then_delete), self.assertRaises(OSError):
+            pack_directory(str(self.src), str(self.base), False, self.base, incremental=True)
+
+        assert_file_hash(self, expected_hash, self.src_rfa)
+
+        create_dummy_file(self.src / 'baz.con', 'changed')
+        pack_directory(str(self.src), str(self.base), False, self.base, incremental=True)
+
+        assert_rfa(self, self.src_rfa, [
+            'src/foo.con',
+            'src/bar.con',
+            'src/baz.con'
+        ])
+        self.assertEqual('changed\n', RefractorFlatArchive(self.src_rfa).extractFile('src/baz.con', asString=True))
+
+    def test_incremental_repacks_rfa_packed_with_other_options(self):
+        pack_directory(str(self.src), str(self.base), False, self.base, incremental=True)
+        original = self.src_rfa.read_bytes()
+
+        create_dummy_file(self.src / 'foo.con', 'changed')
+        pack_directory(str(self.src), str(self.base), False, self.base, incremental=True, compression=CompressionPolicy(COMPRESSION_STORE), patch=True)
+
+        # a patch would have kept the original bytes in place
+        self.assertNotEqual(original[4:], self.src_rfa.read_bytes()[4:len(original)])
+        self.assertEqual('changed\n', RefractorFlatArchive(self.src_rfa).extractFile('src/foo.con', asString=True))
+        self.assertIsNotNone(read_manifest(self.src_rfa, pack_options(compression=CompressionPolicy(COMPRESSION_STORE))))
+
+    def test_incremental_repacks_rfa_if_overwrite_is_true(self):
+        pack_directory(str(self.src), str(self.base), False, self.base, incremental=True)
+        original = self.src_rfa.read_bytes()
+
+        create_dummy_file(self.src / 'foo.con', 'changed')
+        pack_directory(str(self.src), str(self.base), True, self.base, incremental=True, patch=True)
+
+        self.assertNotEqual(original[4:], self.src_rfa.read_bytes()[4:len(original)])
+        self.assertEqual('changed\n', RefractorFlatArchive(self.src_rfa).extractFile('src/foo.con', asString=True))
+
+    def test_incremental_repacks_rfa_without_manifest(self):
+        expected_hash = create_dummy_file(self.src_rfa)
+
+        pack_directory(str(self.src), str(self.base), False, self.base, incremental=True)
+
+        assert_file_hash(self, expected_hash, self.src_rfa, has_changed=True)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -26,7 +26,15 @@ class TestMethod(unittest.TestCase):
 
     def test_correct_rfa_created(self):
         pack_mod(str(self.src), str(self.dst), False)
+        self.assert_packed()
 
+    def test_packs_rfas_in_parallel_processes(self):
+        failed = pack_mod(str(self.src), str(self.dst), False, jobs=2)
+
+        self.assertEqual([], failed)
+        self.assert_packed()
+
+    def assert_packed(self):
         for directory in TOP_LEVEL_RFAS:
             assert_rfa(self, self.dst / f'{directory}.rfa', [
                 f'{directory}/{directory}.con'
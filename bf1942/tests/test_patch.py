@@ -0,0 +1,66 @@
+import os
+import shutil
+import unittest
+from bf1942.RFA import RefractorFlatArchive
+from bf1942.testutil import *
+
+class TestMethod(unittest.TestCase):
+    def setUp(self):
+        self.base = create_dummy_directory(__file__)
+        self.large = os.urandom(100000)
+
+        rfa = RefractorFlatArchive(self.base)
+        rfa.addFileAsString('bf1942/game/gamemodes.con', 'gamemodes')
+        rfa.addFileAsString('bf1942/game/removed.con', 'removed')
+        rfa.addFileAsString('bf1942/game/replaced.con', 'replaced')
+        (self.base / 'large.dat').write_bytes(self.large)
+        rfa.addFile(self.base / 'large.dat', self.base)
+        rfa.write(self.base / 'game.rfa')
+        rfa.write(self.base / 'uncompressed.rfa', compressed=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.base)
+
+    def patch(self, path):
+        rfa = RefractorFlatArchive(path)
+        rfa.addFileAsString('bf1942/game/replaced.con', 'replaced again')
+        rfa.addFileAsString('bf1942/game/added.con', 'added')
+        rfa.removeFile('bf1942/game/removed.con')
+        rfa.patch()
+        return rfa
+
+    def assert_patched(self, rfa):
+        self.assertEqual(['bf1942/game/added.con', 'bf1942/game/gamemodes.con', 'bf1942/game/replaced.con', 'large.dat'], sorted(rfa.getFileList()))
+        self.assertEqual('replaced again', rfa.extractFile('bf1942/game/replaced.con', asString=True))
+        self.assertEqual('added', rfa.extractFile('bf1942/game/added.con', asString=True))
+        self.assertEqual('gamemodes', rfa.extractFile('bf1942/game/gamemodes.con', asString=True))
+        self.assertEqual(self.large, rfa.extractBlock(rfa.getEntry('large.dat').file_info, asBytes=True))
+        self.assertEqual([], rfa.verify())
+
+    def test_appends_changed_entries(self):
+        for name in ('game.rfa', 'uncompressed.rfa'):
+            path = self.base / name
+            original = path.read_bytes()
+            large = RefractorFlatArchive(path).getEntry('large.dat').file_info.doffset
+
+            rfa = self.patch(path)
+            patched = path.read_bytes()
+
+            self.assertEqual(original[4:], patched[4:len(original)])
+            self.assertEqual(large, rfa.getEntry('large.dat').file_info.doffset)
+            self.assert_patched(rfa)
+            self.assert_patched(RefractorFlatArchive(path))
+
+    def test_compact_reclaims_dead_space(self):
+        path = self.base / 'game.rfa'
+        self.patch(path)
+        shutil.copy(path, self.base / 'patched.rfa')
+
+        RefractorFlatArchive(path).compact()
+
+        self.assertLess(os.path.getsize(path), os.path.getsize(self.base / 'patched.rfa'))
+        self.assert_patched(RefractorFlatArchive(path))
+        self.assertEqual(([], [], []), RefractorFlatArchive(self.base / 'patched.rfa').diff(RefractorFlatArchive(path)))
+
+if __name__ == '__main__':
+    unittest.main()
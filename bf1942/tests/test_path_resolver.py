@@ -0,0 +1,53 @@
+import shutil
+import unittest
+from unittest import mock
+from bf1942 import path
+from bf1942.path import PathResolver
+from bf1942.testutil import *
+
+class TestMethod(unittest.TestCase):
+    def setUp(self):
+        self.base = create_dummy_directory(__file__)
+        (self.base / 'Archives' / 'BF1942' / 'Levels' / 'Berlin').mkdir(parents=True, exist_ok=True)
+        (self.base / 'Archives' / 'Objects').mkdir(parents=True, exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.base)
+
+    def test_join_many(self):
+        resolver = PathResolver()
+        paths = ['archives/bf1942/levels/berlin', 'archives/objects', 'ARCHIVES/Missing/foo', 'archives/bf1942/levels/stalingrad']
+        expected = [
+            self.base / 'Archives' / 'BF1942' / 'Levels' / 'Berlin',
+            self.base / 'Archives' / 'Objects',
+            self.base / 'Archives' / 'Missing' / 'foo',
+            self.base / 'Archives' / 'BF1942' / 'Levels' / 'stalingrad'
+        ]
+
+        with mock.patch.object(path.os, 'scandir', wraps=path.os.scandir) as scandir:
+            self.assertEqual(expected, resolver.join_many(self.base, paths))
+            self.assertEqual(expected[1], resolver.join(self.base, 'Archives/objects'))
+
+        # base, archives, bf1942, levels, each listed once
+        self.assertEqual(4, scandir.call_count)
+
+    def test_mkdir_invalidates_listing(self):
+        resolver = PathResolver()
+        self.assertEqual(self.base / 'Archives' / 'texture', resolver.join(self.base, 'archives/texture'))
+
+        resolver.mkdir(self.base / 'Archives' / 'Texture')
+
+        self.assertEqual(self.base / 'Archives' / 'Texture', resolver.join(self.base, 'archives/texture'))
+
+    def test_invalidate(self):
+        resolver = PathResolver()
+        self.assertEqual(self.base / 'Archives' / 'sound', resolver.join(self.base, 'archives/sound'))
+
+        (self.base / 'Archives' / 'Sound').mkdir()
+        self.assertEqual(self.base / 'Archives' / 'sound', resolver.join(self.base, 'archives/sound'))
+        resolver.invalidate(self.base / 'Archives')
+
+        self.assertEqual(self.base / 'Archives' / 'Sound', resolver.join(self.base, 'archives/sound'))
+
+if __name__ == '__main__':
+    unittest.main()
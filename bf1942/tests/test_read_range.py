@@ -0,0 +1,46 @@
+import os
+import shutil
+import unittest
+from unittest import mock
+from bf1942 import RFA
+from bf1942.RFA import MAX_SEGMENT_SIZE, RefractorFlatArchive
+from bf1942.testutil import *
+
+class TestMethod(unittest.TestCase):
+    def setUp(self):
+        self.base = create_dummy_directory(__file__)
+        self.src = self.base / 'src'
+        self.contents = os.urandom(5 * MAX_SEGMENT_SIZE) + b'\x00' * 5 * MAX_SEGMENT_SIZE + b'tail'
+
+        (self.src / 'bf1942' / 'levels' / 'level').mkdir(parents=True, exist_ok=True)
+        (self.src / 'bf1942' / 'levels' / 'level' / 'heightmap.raw').write_bytes(self.contents)
+
+        for compressed in (True, False):
+            rfa = RefractorFlatArchive(self.src, read=False)
+            rfa.addDirectory(self.src)
+            rfa.write(self.base / f'{compressed}.rfa', compressed=compressed)
+
+    def tearDown(self):
+        shutil.rmtree(self.base)
+
+    def test_reads_ranges(self):
+        for compressed in (True, False):
+            rfa = RefractorFlatArchive(self.base / f'{compressed}.rfa')
+            path = 'bf1942/levels/level/heightmap.raw'
+            for offset, length in [(0, 10), (MAX_SEGMENT_SIZE - 3, 6), (2 * MAX_SEGMENT_SIZE, 3 * MAX_SEGMENT_SIZE + 1), (len(self.contents) - 2, 10)]:
+                self.assertEqual(self.contents[offset:offset + length], rfa.readRange(path, offset, length))
+            self.assertEqual(b'', rfa.readRange(path, len(self.contents) + 10, 10))
+
+    def test_decompresses_covering_segments_only(self):
+        rfa = RefractorFlatArchive(self.base / 'True.rfa')
+        with mock.patch.object(RFA.lzo, 'decompress', wraps=RFA.lzo.decompress) as decompress:
+            rfa.readRange('bf1942/levels/level/heightmap.raw', 4 * MAX_SEGMENT_SIZE - 1, 2)
+        self.assertEqual(2, decompress.call_count)
+
+    def test_missing_entry(self):
+        rfa = RefractorFlatArchive(self.base / 'True.rfa')
+        with self.assertRaises(FileNotFoundError):
+            rfa.readRange('bf1942/levels/level/missing.raw', 0, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import shutil
+import unittest
+from bf1942.RFA import RefractorFlatArchive, RefractorFlatArchiveGroup
+from bf1942.testutil import *
+
+class TestMethod(unittest.TestCase):
+    def setUp(self):
+        self.base = create_dummy_directory(__file__)
+
+        mod = RefractorFlatArchive(self.base)
+        mod.addFileAsString('Objects/Jeep.con', 'mod jeep')
+        mod.addFileAsString('objects/mod.con', 'mod')
+        mod.write(self.base / 'mod.rfa')
+
+        game = RefractorFlatArchive(self.base)
+        game.addFileAsString('objects/jeep.con', 'game jeep')
+        game.addFileAsString('objects/game.con', 'game')
+        game.write(self.base / 'game.rfa')
+
+        self.group = RefractorFlatArchiveGroup([self.base / 'mod.rfa', self.base / 'game.rfa'])
+
+    def tearDown(self):
+        shutil.rmtree(self.base)
+
+    def test_first_archive_wins(self):
+        self.assertEqual('Objects/Jeep.con', self.group.getCorrectFilePath('objects/jeep.con'))
+        self.assertEqual('mod jeep', self.group.extractFile('OBJECTS/JEEP.CON', asString=True))
+
+    def test_resolves_paths_from_every_archive(self):
+        self.assertTrue(self.group.fileExists('objects\\game.con'))
+        self.assertTrue(self.group.fileExists('objects/mod.con'))
+        self.assertFalse(self.group.fileExists('objects/missing.con'))
+        self.assertEqual('game', self.group.extractFile('objects/game.con', asString=True))
+        self.assertFalse(self.group.extractFile('objects/missing.con', asString=True))
+
+    def test_extract_many(self):
+        missing = self.group.extractMany(['objects/jeep.con', 'objects/game.con', 'objects/missing.con'], self.base / 'dst')
+
+        self.assertEqual(['objects/missing.con'], missing)
+        self.assertEqual('mod jeep', (self.base / 'dst' / 'Objects' / 'Jeep.con').read_text())
+        self.assertEqual('game', (self.base / 'dst' / 'objects' / 'game.con').read_text())
+
+    def test_file_list_has_no_duplicates(self):
+        self.assertEqual(['Objects/Jeep.con', 'objects/mod.con', 'objects/game.con'], self.group.getFileList())
+
+    def test_rebuilt_index_includes_added_entries(self):
+        mod = self.group.rfas[0]
+        mod.addFileAsString('objects/added.con', 'added')
+        self.group.buildIndex()
+        rfa, entry = self.group.getEntry('OBJECTS/ADDED.CON')
+        self.assertIs(mod, rfa)
+        self.assertEqual('added', entry.file_contents)
+        self.assertEqual('mod jeep', self.group.extractFile('objects/jeep.con', asString=True))
+        self.assertEqual(['Objects/Jeep.con', 'objects/mod.con', 'objects/added.con', 'objects/game.con'], self.group.getFileList())
+
+    def test_file_list_view(self):
+        files = self.group.rfas[1].fileList
+        self.assertEqual(2, len(files))
+        self.assertEqual(files[1].path, files[-1].path)
+        self.assertEqual(['objects/game.con', 'objects/jeep.con'], sorted(file.path for file in files))
+        self.assertEqual([files[0].path], [file.path for file in files[:1]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import shutil
+import unittest
+from bf1942.RFA import RefractorFlatArchive, RefractorFlatArchiveGroup
+from bf1942.rfacache import RfaTocCache
+from bf1942.testutil import *
+
+class TestMethod(unittest.TestCase):
+    def setUp(self):
+        self.base = create_dummy_directory(__file__)
+        self.rfa_path = self.base / 'objects.rfa'
+        self.cache = RfaTocCache(self.base / 'cache')
+
+        rfa = RefractorFlatArchive(self.base)
+        rfa.addFileAsString('objects/objects.con', 'objects')
+        rfa.addFileAsString('objects/vehicles/jeep.con', 'jeep')
+        rfa.write(self.rfa_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.base)
+
+    def test_cache_is_written_on_first_read(self):
+        RefractorFlatArchive(self.rfa_path, tocCache=self.cache)
+
+        self.assertTrue(self.cache.cache_path(self.rfa_path).exists())
+
+    def test_cached_entries_match_archive(self):
+        expected = RefractorFlatArchive(self.rfa_path, tocCache=self.cache)
+        cached = RefractorFlatArchive(self.rfa_path, read=False, tocCache=self.cache)
+
+        self.assertTrue(cached.readCached())
+        self.assertTrue(cached.success)
+        self.assertEqual(expected.compressed, cached.compressed)
+        self.assertEqual(expected.xpackHeaderId, cached.xpackHeaderId)
+        self.assertEqual(expected.getFileList(), cached.getFileList())
+        for file in expected.fileList:
+            cached_info = cached.getEntry(file.path).file_info
+            self.assertEqual((file.file_info.csize, file.file_info.ucsize, file.file_info.doffset), (cached_info.csize, cached_info.ucsize, cached_info.doffset))
+        self.assertEqual('jeep', cached.extractFile('objects/vehicles/jeep.con', asString=True))
+
+    def test_cache_is_ignored_after_archive_changes(self):
+        RefractorFlatArchive(self.rfa_path, tocCache=self.cache)
+
+        rfa = RefractorFlatArchive(self.rfa_path)
+        rfa.addFileAsString('objects/new.con', 'new')
+        rfa.write()
+
+        self.assertFalse(RefractorFlatArchive(self.rfa_path, read=False, tocCache=self.cache).readCached())
+        self.assertIn('objects/new.con', RefractorFlatArchive(self.rfa_path, tocCache=self.cache).getFileList())
+
+    def test_group_uses_cache(self):
+        RefractorFlatArchiveGroup([self.rfa_path], tocCache=self.cache)
+
+        self.assertTrue(self.cache.cache_path(self.rfa_path).exists())
+
+if __name__ == '__main__':
+    unittest.main()
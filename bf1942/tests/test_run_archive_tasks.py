@@ -0,0 +1,80 @@
+import logging
+import multiprocessing
+import os
+import unittest
+from bf1942.rfautil import ArchiveTask, LogRecordCollector, logger, run_archive_tasks
+
+def succeed(name, order):
+    logger.info(f'done {name}')
+    order.append(name)
+
+def fail(name, order):
+    raise RuntimeError(f'{name} is broken')
+
+def die(name, order):
+    os._exit(1)
+
+class TestMethod(unittest.TestCase):
+    def test_runs_largest_task_first(self):
+        order = []
+
+        run_archive_tasks([
+            ArchiveTask('small', 1, succeed, ('small', order)),
+            ArchiveTask('large', 3, succeed, ('large', order)),
+            ArchiveTask('medium', 2, succeed, ('medium', order))
+        ])
+
+        self.assertEqual(['large', 'medium', 'small'], order)
+
+    def test_failed_tasks_are_reported(self):
+        for jobs in [None, 2]:
+            with self.assertLogs(level=logging.INFO) as logs:
+                failed = run_archive_tasks([
+                    ArchiveTask('good', 1, succeed, ('good', [])),
+                    ArchiveTask('bad', 2, fail, ('bad', []))
+                ], jobs)
+
+            self.assertEqual(['bad'], failed)
+            self.assertTrue(any('done good' in line for line in logs.output))
+            self.assertTrue(any('bad is broken' in line for line in logs.output))
+
+    def test_spawned_workers(self):
+        with self.assertLogs(level=logging.INFO) as logs:
+            failed = run_archive_tasks([
+                ArchiveTask('good', 1, succeed, ('good', [])),
+                ArchiveTask('bad', 2, fail, ('bad', []))
+            ], 2, multiprocessing.get_context('spawn'))
+
+        self.assertEqual(['bad'], failed)
+        self.assertTrue(any('done good' in line for line in logs.output))
+        self.assertTrue(any('bad is broken' in line for line in logs.output))
+
+    def test_dead_worker_is_reported(self):
+        with self.assertLogs(level=logging.ERROR) as logs:
+            failed = run_archive_tasks([
+                ArchiveTask('dead', 1, die, ('dead', []))
+            ], 2)
+
+        self.assertEqual(['dead'], failed)
+        self.assertTrue(any('dead failed' in line for line in logs.output))
+
+    def test_worker_records_respect_level_of_calling_process(self):
+        root_logger = logging.getLogger()
+        collector = LogRecordCollector()
+        level = root_logger.level
+        root_logger.addHandler(collector)
+        root_logger.setLevel(logging.WARNING)
+
+        try:
+            for jobs in [None, 2]:
+                run_archive_tasks([
+                    ArchiveTask('good', 1, succeed, ('good', []))
+                ], jobs)
+        finally:
+            root_logger.removeHandler(collector)
+            root_logger.setLevel(level)
+
+        self.assertEqual([], [record.msg for record in collector.records])
+
+if __name__ == '__main__':
+    unittest.main()
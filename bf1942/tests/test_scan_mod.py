@@ -0,0 +1,59 @@
+import shutil
+import unittest
+from pathlib import Path
+from unittest import mock
+from bf1942 import rfautil
+from bf1942.rfautil import scan_mod
+from bf1942.testutil import *
+
+class TestMethod(unittest.TestCase):
+    def setUp(self):
+        self.base = create_dummy_directory(__file__)
+        self.extracted = self.base / 'extracted'
+        self.archives = self.base / 'archives'
+
+        create_dummy_file(self.extracted / 'Objects' / 'vehicles' / 'jeep' / 'jeep.con')
+        create_dummy_file(self.extracted / 'unknown' / 'unknown.con')
+        create_dummy_file(self.extracted / 'BF1942' / 'game' / 'gamemodes.con')
+        create_dummy_file(self.extracted / 'BF1942' / 'Levels' / 'Berlin' / 'init.con', 'x' * 100)
+        create_dummy_file(self.extracted / 'BF1942' / 'Levels' / 'Wake' / 'init.con')
+
+        create_dummy_file(self.archives / 'objects.rfa')
+        create_dummy_file(self.archives / 'unknown.rfa')
+        create_dummy_file(self.archives / 'BF1942' / 'game.rfa')
+        create_dummy_file(self.archives / 'BF1942' / 'Levels' / 'berlin.rfa', 'x' * 100)
+        create_dummy_file(self.archives / 'BF1942' / 'Levels' / 'readme.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.base)
+
+    def summary(self, archives):
+        return [(archive.name, archive.path, archive.directory, archive.size) for archive in archives]
+
+    def test_scans_archives(self):
+        self.assertEqual([
+            ('objects.rfa', self.archives / 'objects.rfa', Path(), 4),
+            ('game.rfa', self.archives / 'BF1942' / 'game.rfa', Path('BF1942'), 4),
+            ('berlin.rfa', self.archives / 'BF1942' / 'Levels' / 'berlin.rfa', Path('BF1942', 'Levels'), 101)
+        ], self.summary(scan_mod(self.archives)))
+
+    def test_scans_extracted_mod(self):
+        self.assertEqual([
+            ('Objects.rfa', self.extracted / 'Objects', Path(), 4),
+            ('game.rfa', self.extracted / 'BF1942' / 'game', Path('BF1942'), 4),
+            ('Berlin.rfa', self.extracted / 'BF1942' / 'Levels' / 'Berlin', Path('BF1942', 'Levels'), 101),
+            ('Wake.rfa', self.extracted / 'BF1942' / 'Levels' / 'Wake', Path('BF1942', 'Levels'), 4)
+        ], self.summary(scan_mod(self.extracted, extracted=True, sizes=True)))
+
+    def test_only_scans_archive_locations(self):
+        with mock.patch.object(rfautil.os, 'scandir', wraps=rfautil.os.scandir) as scandir:
+            archives = scan_mod(self.extracted, extracted=True)
+
+        self.assertEqual([0, 0, 0, 0], [archive.size for archive in archives])
+        self.assertEqual(3, scandir.call_count)
+
+    def test_missing_mod(self):
+        self.assertEqual([], scan_mod(self.base / 'missing'))
+
+if __name__ == '__main__':
+    unittest.main()
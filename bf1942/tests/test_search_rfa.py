@@ -0,0 +1,62 @@
+import shutil
+import unittest
+from bf1942.RFA import RefractorFlatArchive
+from bf1942.rfasearch import compile_pattern, path_matches, search, search_data, search_rfa
+from bf1942.testutil import *
+
+class TestMethod(unittest.TestCase):
+    def setUp(self):
+        self.base = create_dummy_directory(__file__)
+
+        rfa = RefractorFlatArchive(self.base)
+        rfa.addFileAsString('objects/vehicles/jeep/objects.con', 'ObjectTemplate.create PlayerControlObject Jeep\r\nObjectTemplate.mass 1000\r\n')
+        rfa.addFileAsString('objects/vehicles/jeep/geometries.con', 'GeometryTemplate.create StandardMesh jeep_m1\r\n')
+        rfa.addFileAsString('objects/vehicles/jeep/jeep.tweak', 'ObjectTemplate.active Jeep\nObjectTemplate.mass 1200')
+        rfa.write(self.base / 'objects.rfa')
+
+        (self.base / 'levels').mkdir(exist_ok=True)
+        rfa = RefractorFlatArchive(self.base)
+        rfa.addFileAsString('bf1942/levels/level/init.con', 'run objects/jeep\r\n')
+        rfa.write(self.base / 'levels' / 'level.rfa')
+
+    def tearDown(self):
+        shutil.rmtree(self.base)
+
+    def matches(self, results):
+        return [(match.path, match.line_number, match.line) for match in results]
+
+    def test_reports_matching_lines(self):
+        pattern = compile_pattern(r'mass \d+')
+        expected = [
+            ('objects/vehicles/jeep/objects.con', 2, 'ObjectTemplate.mass 1000'),
+            ('objects/vehicles/jeep/jeep.tweak', 2, 'ObjectTemplate.mass 1200')
+        ]
+
+        for workers in (None, 4):
+            self.assertEqual(sorted(expected), sorted(self.matches(search_rfa(self.base / 'objects.rfa', pattern, workers=workers))))
+
+    def test_filters_paths_before_searching(self):
+        pattern = compile_pattern('JEEP', literal=True, ignore_case=True)
+        results = search_rfa(self.base / 'objects.rfa', pattern, include=['*.CON'], exclude=['*/geometries.con'])
+
+        self.assertEqual([('objects/vehicles/jeep/objects.con', 1, 'ObjectTemplate.create PlayerControlObject Jeep')], self.matches(results))
+
+    def test_searches_directories(self):
+        results = list(search([self.base], compile_pattern('objects/jeep', literal=True)))
+
+        self.assertEqual([('bf1942/levels/level/init.con', 1, 'run objects/jeep')], self.matches(results))
+        self.assertEqual(self.base / 'levels' / 'level.rfa', results[0].rfa)
+
+    def test_reports_each_line_once(self):
+        data = b'a a\na\r\nb\n\na'
+
+        self.assertEqual([(1, 'a a'), (2, 'a'), (5, 'a')], list(search_data(data, compile_pattern('a'))))
+
+    def test_path_matches(self):
+        self.assertTrue(path_matches('Objects/Jeep.con'))
+        self.assertTrue(path_matches('Objects/Jeep.con', include=['objects/*']))
+        self.assertFalse(path_matches('Objects/Jeep.con', include=['*.inc']))
+        self.assertFalse(path_matches('Objects/Jeep.con', exclude=['*.con']))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import shutil
+import unittest
+from unittest import mock
+from bf1942 import RFA
+from bf1942.RFA import RefractorFlatArchive
+from bf1942.manifest import hashes_path
+from bf1942.rfautil import verify_rfa
+from bf1942.testutil import *
+
+class TestMethod(unittest.TestCase):
+    def setUp(self):
+        self.base = create_dummy_directory(__file__)
+        self.src = self.base / 'src'
+
+        (self.src / 'objects').mkdir(parents=True, exist_ok=True)
+        (self.src / 'objects' / 'large.dat').write_bytes(b'abcd' * 50000)
+        (self.src / 'objects' / 'empty.con').write_bytes(b'')
+        create_dummy_file(self.src / 'objects' / 'objects.con')
+
+        for compressed in (True, False):
+            rfa = RefractorFlatArchive(self.src, read=False)
+            rfa.addDirectory(self.src)
+            rfa.write(self.base / f'{compressed}.rfa', compressed=compressed)
+
+    def tearDown(self):
+        shutil.rmtree(self.base)
+
+    def corrupt(self, path, position, value):
+        with open(path, 'r+b') as file:
+            file.seek(position)
+            file.write(value)
+
+    def large_offset(self, path):
+        return RefractorFlatArchive(path).getEntry('objects/large.dat').file_info.doffset
+
+    def test_intact_archives(self):
+        for compressed in (True, False):
+            progress = mock.Mock()
+            self.assertEqual([], verify_rfa(self.base / f'{compressed}.rfa', workers=2, progress=progress))
+            progress.assert_called_with(3, 3)
+
+    def test_corrupt_segment_data(self):
+        path = self.base / 'True.rfa'
+        offset = self.large_offset(path)
+        segments = RefractorFlatArchive(path).getEntry('objects/large.dat').file_info.ucsize // 32768 + 1
+        self.corrupt(path, offset + 4 + 12 * segments, b'\xff\xff\xff\xff')
+
+        problems = verify_rfa(path)
+        self.assertEqual('objects/large.dat', problems[0][0])
+        self.assertTrue(problems[0][1].startswith('segment 0 '))
+
+    def test_corrupt_segment_table(self):
+        path = self.base / 'True.rfa'
+        self.corrupt(path, self.large_offset(path) + 8, b'\x00\x00\x00\x00')
+
+        self.assertEqual([('objects/large.dat', 'segments hold 167232 bytes, the table of contents 200000')], verify_rfa(path))
+
+    def test_truncated_archive(self):
+        path = self.base / 'False.rfa'
+        with open(path, 'r+b') as file:
+            file.truncate(self.large_offset(path) + 10)
+
+        self.assertEqual([(None, 'header or table of contents could not be read')], verify_rfa(path))
+
+    def test_empty_archive(self):
+        path = self.base / 'empty.rfa'
+        RefractorFlatArchive(self.src, read=False).write(path)
+
+        self.assertEqual([], verify_rfa(path))
+
+    def test_recorded_hashes(self):
+        for compressed in (True, False):
+            path = self.base / f'{compressed}.rfa'
+            self.assertEqual([], verify_rfa(path, record_hashes=True))
+            self.assertTrue(hashes_path(path).exists())
+
+            with mock.patch.object(RFA.lzo, 'decompress') as decompress:
+                self.assertEqual([], verify_rfa(path, use_hashes=True))
+                self.corrupt(path, self.large_offset(path) + 1000, b'x')
+                self.assertEqual([('objects/large.dat', 'stored bytes do not match the recorded hash')], verify_rfa(path, use_hashes=True))
+            decompress.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
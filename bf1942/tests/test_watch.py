@@ -0,0 +1,101 @@
+import shutil
+import unittest
+from unittest import mock
+from bf1942.RFA import RefractorFlatArchive
+from bf1942.manifest import read_manifest, scan_sources
+from bf1942.watch import PollingWatcher, WatchedArchive, watch
+from bf1942.testutil import *
+
+class FakeWatcher:
+    def __init__(self, changes):
+        self.changes_seen = list(changes)
+        self.timeouts = []
+
+    def changes(self, timeout=None):
+        self.timeouts.append(timeout)
+        if not self.changes_seen:
+            raise KeyboardInterrupt()
+        return self.changes_seen.pop(0)
+
+class TestMethod(unittest.TestCase):
+    def setUp(self):
+        self.base = create_dummy_directory(__file__)
+        self.src = self.base / 'src' / 'objects'
+        self.dst = self.base / 'dst'
+        self.dst.mkdir(exist_ok=True)
+
+        create_dummy_file(self.src / 'objects.con', 'objects')
+        create_dummy_file(self.src / 'vehicles' / 'jeep.con', 'jeep')
+
+    def tearDown(self):
+        shutil.rmtree(self.base)
+
+    def test_watched_archive_updates_changed_entries(self):
+        archive = WatchedArchive(self.src, self.dst, self.base / 'src')
+        self.assertTrue((self.dst / 'objects.rfa').exists())
+        self.assertIsNotNone(read_manifest(self.dst / 'objects.rfa'))
+        self.assertFalse(archive.update())
+
+        create_dummy_file(self.src / 'vehicles' / 'jeep.con', 'new jeep')
+        create_dummy_file(self.src / 'vehicles' / 'tank.con', 'tank')
+        (self.src / 'objects.con').unlink()
+        self.assertTrue(archive.update())
+
+        rfa = RefractorFlatArchive(self.dst / 'objects.rfa')
+        self.assertEqual(['objects/vehicles/jeep.con', 'objects/vehicles/tank.con'], sorted(rfa.getFileList()))
+        self.assertEqual('new jeep\n', rfa.extractFile('objects/vehicles/jeep.con', asString=True))
+        self.assertEqual(sorted(rfa.getFileList()), sorted(archive.rfa.getFileList()))
+        self.assertEqual(read_manifest(self.dst / 'objects.rfa'), archive.files)
+
+    def test_watched_archive_retries_update_if_source_disappears(self):
+        archive = WatchedArchive(self.src, self.dst, self.base / 'src')
+        files = archive.files
+        expected_hash = compute_hash(self.dst / 'objects.rfa')
+
+        def scan_then_delete(*args):
+            scanned = scan_sources(*args)
+            (self.src / 'objects.con').unlink()
+            return scanned
+
+        create_dummy_file(self.src / 'objects.con', 'new objects')
+        create_dummy_file(self.src / 'vehicles' / 'tank.con', 'tank')
+        with mock.patch('bf1942.watch.scan_sources', scan_then_delete), self.assertRaises(OSError):
+            archive.update()
+
+        self.assertEqual(files, archive.files)
+        self.assertEqual(files, read_manifest(self.dst / 'objects.rfa'))
+        assert_file_hash(self, expected_hash, self.dst / 'objects.rfa')
+
+        # saved again, as editors do by deleting and recreating a file
+        create_dummy_file(self.src / 'objects.con', 'new objects')
+        self.assertTrue(archive.update())
+
+        rfa = RefractorFlatArchive(self.dst / 'objects.rfa')
+        self.assertEqual(['objects/objects.con', 'objects/vehicles/jeep.con', 'objects/vehicles/tank.con'], sorted(rfa.getFileList()))
+        self.assertEqual('new objects\n', rfa.extractFile('objects/objects.con', asString=True))
+        self.assertEqual(sorted(rfa.getFileList()), sorted(archive.rfa.getFileList()))
+        self.assertEqual(read_manifest(self.dst / 'objects.rfa'), archive.files)
+
+    def test_polling_watcher(self):
+        watcher = PollingWatcher([self.src], interval=0.01)
+        self.assertEqual(set(), watcher.changes(timeout=0))
+
+        create_dummy_file(self.src / 'vehicles' / 'tank.con', 'tank')
+
+        self.assertEqual({self.src}, watcher.changes(timeout=1))
+        self.assertEqual(set(), watcher.changes(timeout=0))
+
+    def test_watch_debounces_changes(self):
+        archive = mock.Mock(src=self.src)
+        other = mock.Mock(src=self.base / 'other')
+        watcher = FakeWatcher([{self.src}, {self.src}, set(), {other.src}])
+
+        with self.assertRaises(KeyboardInterrupt):
+            watch([archive, other], watcher, debounce=0.25)
+
+        archive.update.assert_called_once()
+        other.update.assert_not_called()
+        self.assertEqual([None, 0.25, 0.25, None, 0.25], watcher.timeouts)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+import os
+import shutil
+import unittest
+from unittest import mock
+from bf1942 import RFA
+from bf1942.RFA import COMPRESSION_FAST, COMPRESSION_STORE, CompressionPolicy, RefractorFlatArchive, storeSegment, storedSegmentSize
+from bf1942.testutil import *
+
+HEADER_SIZE = 156
+
+def read_data(path):
+    # skips the packing timestamp stored in the header
+    contents = Path(path).read_bytes()
+    return contents[:8] + contents[HEADER_SIZE:]
+
+class TestMethod(unittest.TestCase):
+    def setUp(self):
+        self.base = create_dummy_directory(__file__)
+        self.src = self.base / 'src'
+
+        for i in range(10):
+            (self.src / 'objects').mkdir(parents=True, exist_ok=True)
+            (self.src / 'objects' / f'file{i}.dat').write_bytes(os.urandom(i * 10000) + b'x' * i * 10000)
+        create_dummy_file(self.src / 'objects' / 'objects.con')
+        (self.src / 'objects' / 'empty.con').write_bytes(b'')
+
+    def tearDown(self):
+        shutil.rmtree(self.base)
+
+    def write(self, name, **kwargs):
+        rfa = RefractorFlatArchive(self.src, read=False)
+        rfa.addDirectory(self.src)
+        rfa.write(self.base / name, **kwargs)
+        return self.base / name
+
+    def test_parallel_write_matches_serial(self):
+        serial = self.write('serial.rfa')
+        parallel = self.write('parallel.rfa', workers=4)
+
+        self.assertEqual(read_data(serial), read_data(parallel))
+
+    def test_parallel_uncompressed_write_matches_serial(self):
+        serial = self.write('serial.rfa', compressed=False)
+        parallel = self.write('parallel.rfa', compressed=False, workers=4)
+
+        self.assertEqual(read_data(serial), read_data(parallel))
+
+    def test_rewrite_keeps_contents(self):
+        original = self.write('original.rfa')
+        rfa = RefractorFlatArchive(original)
+        rfa.write(self.base / 'rewritten.rfa', workers=2)
+
+        self.assertEqual(read_data(original), read_data(self.base / 'rewritten.rfa'))
+        rfa = RefractorFlatArchive(self.base / 'rewritten.rfa')
+        self.assertEqual(b'', rfa.extractFile('objects/empty.con', asString=True).encode())
+
+    def test_rewrite_converts_compression(self):
+        compressed = self.write('compressed.rfa')
+        uncompressed = self.write('uncompressed.rfa', compressed=False)
+
+        RefractorFlatArchive(compressed).write(self.base / 'to_uncompressed.rfa', compressed=False)
+        RefractorFlatArchive(uncompressed).write(self.base / 'to_compressed.rfa', workers=2)
+
+        self.assertEqual(read_data(uncompressed), read_data(self.base / 'to_uncompressed.rfa'))
+        self.assertEqual(read_data(compressed), read_data(self.base / 'to_compressed.rfa'))
+
+    def test_unmodified_files_are_not_recompressed(self):
+        original = self.write('original.rfa')
+        rfa = RefractorFlatArchive(original)
+        rfa.addFileAsString('objects/objects.con', 'patched')
+
+        with mock.patch.object(RFA.lzo, 'compress', wraps=RFA.lzo.compress) as compress:
+            rfa.write(self.base / 'patched.rfa')
+
+        self.assertEqual(1, compress.call_count)
+        patched = RefractorFlatArchive(self.base / 'patched.rfa')
+        self.assertEqual('patched', patched.extractFile('objects/objects.con', asString=True))
+        self.assertEqual(rfa.extractFile('objects/file9.dat', asString=True), patched.extractFile('objects/file9.dat', asString=True))
+
+    def test_recompress_applies_compression_to_unmodified_files(self):
+        original = self.write('original.rfa')
+        rfa = RefractorFlatArchive(original)
+
+        with mock.patch.object(RFA.lzo, 'compress', wraps=RFA.lzo.compress) as compress:
+            rfa.write(self.base / 'copied.rfa', compression=CompressionPolicy(COMPRESSION_FAST))
+            self.assertEqual(0, compress.call_count)
+
+            rfa.write(self.base / 'fast.rfa', compression=CompressionPolicy(COMPRESSION_FAST), recompress=True)
+            self.assertTrue(all(call.args[1] == COMPRESSION_FAST for call in compress.call_args_list))
+            self.assertGreater(compress.call_count, 0)
+
+        self.assertEqual(read_data(original), read_data(self.base / 'copied.rfa'))
+        self.assertEqual(read_data(self.write('expected.rfa', compression=CompressionPolicy(COMPRESSION_FAST))), read_data(self.base / 'fast.rfa'))
+
+    def test_compact_recompresses_with_compression(self):
+        rfa = RefractorFlatArchive(self.write('original.rfa'))
+        rfa.compact(compression=CompressionPolicy(COMPRESSION_STORE), recompress=True)
+
+        self.assertEqual(read_data(self.write('expected.rfa', compression=CompressionPolicy(COMPRESSION_STORE))), read_data(rfa.path))
+
+    def test_unreadable_source_fails_write(self):
+        original = self.write('original.rfa')
+        expected_hash = compute_hash(original)
+        rfa = RefractorFlatArchive(original)
+        rfa.addFile(str(self.src / 'objects' / 'missing.con'), self.src)
+
+        with self.assertRaises(OSError):
+            rfa.write(self.base / 'failed.rfa')
+        with self.assertRaises(OSError):
+            rfa.write()
+
+        self.assertFalse((self.base / 'failed.rfa').exists())
+        self.assertFalse(Path(str(original) + 'tmp').exists())
+        assert_file_hash(self, expected_hash, original)
+
+    def test_overwriting_self_rereads_entries(self):
+        rfa = RefractorFlatArchive(self.write('original.rfa'))
+        rfa.addFileAsString('objects/objects.con', 'patched')
+        rfa.write()
+        rfa.write()
+
+        self.assertFalse(rfa.getEntry('objects/objects.con').is_external)
+        self.assertEqual('patched', RefractorFlatArchive(rfa.path).extractFile('objects/objects.con', asString=True))
+
+    def test_deduplicate_stores_identical_files_once(self):
+        for name in ['copy1.dat', 'copy2.dat']:
+            (self.src / 'objects' / name).write_bytes((self.src / 'objects' / 'file5.dat').read_bytes())
+
+        plain = self.write('plain.rfa')
+        deduplicated = self.write('deduplicated.rfa', deduplicate=True)
+
+        rfa = RefractorFlatArchive(deduplicated)
+        offsets = set(rfa.getEntry(f'objects/{name}').file_info.doffset for name in ['copy1.dat', 'copy2.dat', 'file5.dat'])
+        self.assertEqual(1, len(offsets))
+        self.assertLess(deduplicated.stat().st_size, plain.stat().st_size)
+
+        rfa.extractAll(self.base / 'dst')
+        for name in ['copy1.dat', 'copy2.dat', 'file0.dat', 'file9.dat', 'empty.con']:
+            assert_file_hash(self, compute_hash(self.src / 'objects' / name), self.base / 'dst' / 'objects' / name)
+
+    def test_compression_policy_per_extension(self):
+        policy = CompressionPolicy(extensions={'.DAT': COMPRESSION_STORE, '.con': COMPRESSION_FAST})
+        rfa = RefractorFlatArchive(self.write('policy.rfa', compression=policy))
+
+        with rfa.mapped() as buffer:
+            dataStart, segments = rfa.readSegmentTable(rfa.getEntry('objects/file1.dat').file_info)
+            csize, ucsize, doffset = segments[0]
+            stored = buffer[dataStart + doffset:dataStart + doffset + csize]
+
+        self.assertEqual(storeSegment((self.src / 'objects' / 'file1.dat').read_bytes()[:32768]), stored)
+
+        rfa.extractAll(self.base / 'dst')
+        for name in ['file0.dat', 'file9.dat', 'objects.con', 'empty.con']:
+            assert_file_hash(self, compute_hash(self.src / 'objects' / name), self.base / 'dst' / 'objects' / name)
+
+    def test_store_incompressible(self):
+        contents = os.urandom(40000)
+        (self.src / 'objects' / 'random.dat').write_bytes(contents)
+        rfa = RefractorFlatArchive(self.write('stored.rfa', compression=CompressionPolicy(storeIncompressible=True)))
+
+        self.assertGreaterEqual(4 + 2 * 12 + storedSegmentSize(32768) + storedSegmentSize(40000 - 32768), rfa.getEntry('objects/random.dat').file_info.csize)
+        self.assertEqual(contents, rfa.extractBlock(rfa.getEntry('objects/random.dat').file_info, asBytes=True))
+
+    def test_compression_report(self):
+        rfa = RefractorFlatArchive(self.src, read=False)
+        rfa.addDirectory(self.src)
+        report = rfa.compressionReport()
+
+        self.assertEqual(10, report['.dat']['files'])
+        self.assertEqual(sum(i * 20000 for i in range(10)), report['.dat']['size'])
+        self.assertLess(report['.dat'][COMPRESSION_FAST][0], report['.dat'][COMPRESSION_STORE][0])
+
+if __name__ == '__main__':
+    unittest.main()
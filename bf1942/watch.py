@@ -0,0 +1,183 @@
+import logging
+import os
+import time
+from pathlib import Path
+from bf1942.RFA import RefractorFlatArchive
+from bf1942.manifest import read_manifest, scan_sources, write_manifest
+from bf1942.path import PathResolver
+from bf1942.rfautil import pack_directory, pack_options, rfa_destination, scan_mod, update_rfa
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+logger = logging.getLogger(__name__)
+
+WATCH_DEBOUNCE = 0.5 # seconds without changes before affected RFAs are repacked
+WATCH_POLL_INTERVAL = 1.0 # seconds between scans of the sources when inotify is not available
+
+class WatchedArchive:
+    '''An RFA kept up to date with its source directory, its table of contents and manifest stay in memory between updates.'''
+
+    def __init__(self, src, dst, base, workers=None, deduplicate=False, compression=None):
+        self.src = Path(src)
+        self.rfa_path = rfa_destination(src, dst)
+        self.base = base
+        self.workers = workers
+        self.deduplicate = deduplicate
+        self.compression = compression
+        self.options = pack_options(deduplicate, compression)
+
+        # brings the RFA up to date, in full if it was not packed incrementally with the same options before
+        pack_directory(self.src, self.rfa_path, False, base, workers, True, deduplicate, compression)
+        self.files = read_manifest(self.rfa_path, self.options)
+        self.rfa = RefractorFlatArchive(self.rfa_path)
+
+    def update(self):
+        '''Rewrite the entries whose sources changed since the last update, return whether anything changed.
+
+        Raises if a source cannot be read, the RFA, its manifest and the recorded sources are then left as they were so
+        the next update retries every change since the last successful one.
+        '''
+
+        files, paths = scan_sources(self.src, self.base, self.files)
+
+        if not update_rfa(self.rfa_path, self.files or {}, files, paths, self.workers, self.deduplicate, self.compression, self.rfa):
+            return False
+
+        write_manifest(self.rfa_path, files, self.options)
+        self.files = files
+        return True
+
+class PollingWatcher:
+    '''Detects changes by comparing the size and modification time of every file below the watched directories.'''
+
+    def __init__(self, directories, interval=WATCH_POLL_INTERVAL):
+        self.interval = interval
+        self.snapshots = {Path(directory): snapshot(directory) for directory in directories}
+
+    def changes(self, timeout=None):
+        '''Wait up to timeout seconds, forever if None, for changes and return the watched directories that changed.'''
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            changed = set()
+            for directory, previous in self.snapshots.items():
+                current = snapshot(directory)
+                if current != previous:
+                    self.snapshots[directory] = current
+                    changed.add(directory)
+
+            if changed:
+                return changed
+
+            if deadline is not None and time.monotonic() >= deadline:
+                return changed
+
+            time.sleep(self.interval if deadline is None else max(0, min(self.interval, deadline - time.monotonic())))
+
+class InotifyWatcher:
+    '''Detects changes with inotify, every directory below the watched directories is watched.'''
+
+    def __init__(self, directories):
+        self.inotify = INotify()
+        self.mask = flags.CREATE | flags.DELETE | flags.CLOSE_WRITE | flags.MODIFY | flags.MOVED_FROM | flags.MOVED_TO | flags.ATTRIB
+        self.watches = {}
+
+        for directory in directories:
+            self.add_watches(Path(directory), Path(directory))
+
+    def add_watches(self, root, directory):
+        try:
+            self.watches[self.inotify.add_watch(directory, self.mask)] = (root, directory)
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        self.add_watches(root, Path(entry.path))
+        except OSError:
+            pass
+
+    def changes(self, timeout=None):
+        '''Wait up to timeout seconds, forever if None, for changes and return the watched directories that changed.'''
+
+        changed = set()
+
+        for event in self.inotify.read(timeout=None if timeout is None else int(timeout * 1000)):
+            if event.wd not in self.watches:
+                continue
+
+            root, directory = self.watches[event.wd]
+            changed.add(root)
+
+            if event.mask & flags.ISDIR and event.mask & (flags.CREATE | flags.MOVED_TO):
+                self.add_watches(root, directory / event.name)
+
+        return changed
+
+def snapshot(directory):
+    files = {}
+
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    files.update(snapshot(entry.path))
+                elif entry.is_file():
+                    stat = entry.stat()
+                    files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+    except OSError:
+        pass
+
+    return files
+
+def create_watcher(directories, poll=False):
+    '''Return an inotify based watcher if inotify_simple is installed and poll is false, a polling one otherwise.'''
+
+    if INotify is not None and not poll:
+        return InotifyWatcher(directories)
+
+    return PollingWatcher(directories)
+
+def watch(archives, watcher, debounce=WATCH_DEBOUNCE):
+    '''Update the archives whose sources changed once no change was seen for debounce seconds, until interrupted.'''
+
+    archives = {archive.src: archive for archive in archives}
+    dirty = set()
+
+    while True:
+        changed = watcher.changes(debounce if dirty else None)
+
+        if changed:
+            dirty |= changed
+            continue
+
+        for src in sorted(dirty):
+            try:
+                archives[src].update()
+            except Exception as e:
+                # sources can vanish while being saved, the update failed as a whole and the next change retries it
+                logger.error(f'watch: failed to update {archives[src].rfa_path.name}: {e}')
+        dirty.clear()
+
+def watch_directory(src, dst, base, workers=None, deduplicate=False, compression=None, poll=False):
+    archive = WatchedArchive(src, dst, base, workers, deduplicate, compression)
+    logger.info(f'watch: {src}')
+    watch([archive], create_watcher([archive.src], poll))
+
+def watch_mod(src, dst, workers=None, deduplicate=False, compression=None, poll=False):
+    src_path = Path(src)
+    dst_path = Path(dst)
+    resolver = PathResolver()
+    archives = []
+
+    resolver.mkdir(dst_path, parents=True, exist_ok=True)
+
+    for item in scan_mod(src_path, extracted=True):
+        archive_dst_path = resolver.join(dst_path, item.directory)
+        resolver.mkdir(archive_dst_path, parents=True, exist_ok=True)
+        archives.append(WatchedArchive(item.path, archive_dst_path, src_path, workers, deduplicate, compression))
+
+    logger.info(f'watch: {len(archives)} RFAs in {src}')
+    watch(archives, create_watcher([archive.src for archive in archives], poll))
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+
+import argparse
+import logging
+import sys
+from bf1942.RFA import RefractorFlatArchiveGroup
+from bf1942.rfautil import *
+from bf1942.shell import *
+
+E_DIFFERENT = 1
+
+logging.basicConfig(level=logging.INFO)
+
+parser = argparse.ArgumentParser(description='List the files added, removed and changed between two RFAs or two mods')
+parser.add_argument('old_path', help=r'RFA file or directory searched for RFAs recursively (ie. "c:\Games\Battlefield 1942\Mods\MyMod\Archives")')
+parser.add_argument('new_path', help='RFA file or directory searched for RFAs recursively to compare to old_path')
+parser.add_argument('-w', '--workers', type=int, default=None, help='Number of threads used to hash files, default is to hash serially')
+args = parser.parse_args()
+
+test_src_file(args.old_path)
+test_src_file(args.new_path)
+
+old = RefractorFlatArchiveGroup(find_rfas([args.old_path]))
+new = RefractorFlatArchiveGroup(find_rfas([args.new_path]))
+added, removed, changed = old.diff(new, args.workers)
+
+for status, paths in (('A', added), ('D', removed), ('M', changed)):
+    for path in paths:
+        print(f'{status} {path}')
+
+sys.exit(E_DIFFERENT if added or removed or changed else 0)
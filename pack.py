@@ -4,33 +4,75 @@ import argparse
 import logging
 import os
 import sys
+from bf1942.RFA import COMPRESSION_FAST, COMPRESSION_STORE, CompressionPolicy
 from bf1942.rfautil import *
+from bf1942.watch import watch_directory, watch_mod
 from bf1942.shell import *
 
 E_INVALID_BASE_PATH = 100
+E_ARCHIVE_FAILED = 101
 
-logging.basicConfig(level=logging.INFO)
+def main():
+    logging.basicConfig(level=logging.INFO)
 
-parser = argparse.ArgumentParser(description='Pack one or more directories into RFA archives')
-parser.add_argument('source_path', help='Source path to pack, assumed to be a single directory to pack unless the --mod option is specified, in which case each detected RFA will be packed')
-parser.add_argument('destination_path', help='Destination path for packed RFA(s), RFA file name will match final part of `source_path` if `destination_path` is a directory instead of a path to an RFA file')
-parser.add_argument('-b', '--base-path', dest='base_path', help='Base path for RFA directory structure, default is parent of source_path, ignored when --mod option is used')
-parser.add_argument('-m', '--mod', action='store_true', default=False, help='source_path is an extracted mod with the standard directory structure, all detected RFAs will be packed')
-parser.add_argument('--overwrite', action='store_true', default=False, help='Overwrite any existing files in destination path, otherwise RFAs existing in the destination will be skipped')
-args = parser.parse_args()
+    parser = argparse.ArgumentParser(description='Pack one or more directories into RFA archives')
+    parser.add_argument('source_path', help='Source path to pack, assumed to be a single directory to pack unless the --mod option is specified, in which case each detected RFA will be packed')
+    parser.add_argument('destination_path', help='Destination path for packed RFA(s), RFA file name will match final part of `source_path` if `destination_path` is a directory instead of a path to an RFA file')
+    parser.add_argument('-b', '--base-path', dest='base_path', help='Base path for RFA directory structure, default is parent of source_path, ignored when --mod option is used')
+    parser.add_argument('-m', '--mod', action='store_true', default=False, help='source_path is an extracted mod with the standard directory structure, all detected RFAs will be packed')
+    parser.add_argument('--overwrite', action='store_true', default=False, help='Overwrite any existing files in destination path, otherwise RFAs existing in the destination will be skipped')
+    parser.add_argument('--fast', default='', help='Comma separated list of file extensions compressed with the fast LZO level instead of the best one, ie. ".dds,.tga"')
+    parser.add_argument('--store', default='', help='Comma separated list of file extensions stored without compression, ie. ".bik,.wav"')
+    parser.add_argument('--store-incompressible', dest='store_incompressible', action='store_true', default=False, help='Store segments without compression if compressing them does not reduce their size')
+    parser.add_argument('--compression-report', dest='compression_report', action='store_true', default=False, help='Print the size and time of each compression level per file extension of source_path, nothing is packed')
+    parser.add_argument('-d', '--deduplicate', action='store_true', default=False, help='Store files with identical contents only once in each RFA')
+    parser.add_argument('-i', '--incremental', action='store_true', default=False, help='Only rebuild RFAs whose source files changed since the last incremental pack, recorded in a .manifest file next to each RFA')
+    parser.add_argument('-p', '--patch', action='store_true', default=False, help='Append changed files to RFAs updated by --incremental instead of rewriting them, replaced data is left behind as dead space')
+    parser.add_argument('--watch', action='store_true', default=False, help='Keep running after packing and update the RFAs whose source files change, implies --incremental')
+    parser.add_argument('--poll', action='store_true', default=False, help='Detect changes in --watch mode by scanning source files periodically instead of with inotify')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='Number of RFAs packed in parallel processes when --mod option is specified, largest RFAs are packed first')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='Number of threads used to compress files, default is to compress serially')
+    args = parser.parse_args()
 
-test_src_dir(args.source_path)
-test_dst_dir(args.destination_path)
+    test_src_dir(args.source_path)
+    test_dst_dir(args.destination_path)
 
-# if base path is set, check it is relative to source_path
-if args.mod is None and args.base_path is not None and args.source_path.startswith(args.base_path) is False:
-    eprint(f'Base path "{args.base_path}" must be relative to source directory "{args.source_path}"')
-    sys.exit(E_INVALID_BASE_PATH)
+    # if base path is set, check it is relative to source_path
+    if args.mod is None and args.base_path is not None and args.source_path.startswith(args.base_path) is False:
+        eprint(f'Base path "{args.base_path}" must be relative to source directory "{args.source_path}"')
+        sys.exit(E_INVALID_BASE_PATH)
 
-if args.mod:
-    pack_mod(args.source_path, args.destination_path, args.overwrite)
-else:
-    base_path = Path(args.source_path).parent if args.base_path is None else args.base_path
-    pack_directory(args.source_path, args.destination_path, args.overwrite, base_path)
+    extensions = {}
+    for level, option in [(COMPRESSION_FAST, args.fast), (COMPRESSION_STORE, args.store)]:
+        for extension in filter(None, option.split(',')):
+            extensions[extension if extension.startswith('.') else f'.{extension}'] = level
+    compression = CompressionPolicy(extensions=extensions, storeIncompressible=args.store_incompressible)
 
-sys.exit(0)
+    if args.compression_report:
+        base_path = Path(args.source_path).parent if args.base_path is None or args.mod else args.base_path
+        for line in format_compression_report(compression_report(args.source_path, base_path)):
+            print(line)
+    elif args.watch:
+        try:
+            if args.mod:
+                watch_mod(args.source_path, args.destination_path, args.workers, args.deduplicate, compression, args.poll)
+            else:
+                base_path = Path(args.source_path).parent if args.base_path is None else args.base_path
+                watch_directory(args.source_path, args.destination_path, base_path, args.workers, args.deduplicate, compression, args.poll)
+        except KeyboardInterrupt:
+            pass
+    elif args.mod:
+        if pack_mod(args.source_path, args.destination_path, args.overwrite, args.workers, args.incremental, args.jobs, args.deduplicate, compression, args.patch):
+            sys.exit(E_ARCHIVE_FAILED)
+    else:
+        base_path = Path(args.source_path).parent if args.base_path is None else args.base_path
+        try:
+            pack_directory(args.source_path, args.destination_path, args.overwrite, base_path, args.workers, args.incremental, args.deduplicate, compression, args.patch)
+        except OSError as e:
+            eprint(f'{e}: {e.__cause__}' if e.__cause__ else str(e))
+            sys.exit(E_ARCHIVE_FAILED)
+
+    sys.exit(0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+import argparse
+import logging
+import re
+import sys
+from bf1942.rfasearch import *
+from bf1942.shell import *
+
+E_NO_MATCHES = 1
+E_INVALID_PATTERN = 100
+
+logging.basicConfig(level=logging.INFO)
+
+parser = argparse.ArgumentParser(description='Search the contents of files inside RFAs without extracting them')
+parser.add_argument('pattern', help='Regular expression to search for, or literal text if the --fixed-strings option is specified')
+parser.add_argument('source_path', nargs='+', help=r'RFA file to search or directory searched for RFAs recursively (ie. "c:\Games\Battlefield 1942\Mods\MyMod\Archives")')
+parser.add_argument('-F', '--fixed-strings', dest='fixed_strings', action='store_true', default=False, help='Search for pattern as literal text instead of a regular expression')
+parser.add_argument('-i', '--ignore-case', dest='ignore_case', action='store_true', default=False, help='Match pattern case insensitively')
+parser.add_argument('--include', action='append', default=[], help='Only search files whose path matches this glob, ie. "*.con", may be repeated')
+parser.add_argument('--exclude', action='append', default=[], help='Skip files whose path matches this glob, may be repeated')
+parser.add_argument('-w', '--workers', type=int, default=None, help='Number of threads used to decompress files, default is to search serially')
+args = parser.parse_args()
+
+for source_path in args.source_path:
+    test_src_file(source_path)
+
+try:
+    pattern = compile_pattern(args.pattern, args.fixed_strings, args.ignore_case)
+except re.error as e:
+    eprint(f'Invalid pattern "{args.pattern}": {e}')
+    sys.exit(E_INVALID_PATTERN)
+
+matched = False
+rfas = find_rfas(args.source_path)
+for rfa in rfas:
+    for match in search_rfa(rfa, pattern, args.include, args.exclude, args.workers):
+        matched = True
+        prefix = f'{match.rfa}:' if len(rfas) > 1 else ''
+        print(f'{prefix}{match.path}:{match.line_number}:{match.line}')
+
+sys.exit(0 if matched else E_NO_MATCHES)
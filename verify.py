@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+
+import argparse
+import logging
+import sys
+from bf1942.rfautil import *
+from bf1942.shell import *
+
+E_ARCHIVE_FAILED = 101
+
+logging.basicConfig(level=logging.INFO)
+
+parser = argparse.ArgumentParser(description='Verify the integrity of RFAs without extracting them')
+parser.add_argument('source_path', nargs='+', help=r'RFA file to verify or directory searched for RFAs recursively (ie. "c:\Games\Battlefield 1942\Mods\MyMod\Archives")')
+parser.add_argument('--hashes', action='store_true', default=False, help='Compare files to the hashes recorded next to each RFA instead of decompressing them, RFAs without recorded hashes are verified in full')
+parser.add_argument('--record-hashes', dest='record_hashes', action='store_true', default=False, help='Record the hashes of each fully verified intact RFA in a .sha256 file next to it')
+parser.add_argument('-q', '--quiet', action='store_true', default=False, help='Do not report progress')
+parser.add_argument('-w', '--workers', type=int, default=None, help='Number of threads used to verify files, default is to verify serially')
+args = parser.parse_args()
+
+for source_path in args.source_path:
+    test_src_file(source_path)
+
+def report_progress(name):
+    def progress(done, total):
+        if done == total or done % 100 == 0:
+            eprint(f'\r{name}: {done}/{total} files', end='' if done < total else '\n')
+
+    return None if args.quiet or not sys.stderr.isatty() else progress
+
+failed = []
+for rfa in find_rfas(args.source_path):
+    problems = verify_rfa(rfa, args.workers, args.hashes, args.record_hashes, report_progress(rfa.name))
+
+    for path, problem in problems:
+        print(f'{rfa}: {path}: {problem}' if path else f'{rfa}: {problem}')
+    if problems:
+        failed.append(rfa)
+
+if failed:
+    eprint(f'{len(failed)} RFA(s) failed verification')
+    sys.exit(E_ARCHIVE_FAILED)
+
+sys.exit(0)